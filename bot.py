@@ -1,16 +1,36 @@
+import asyncio
 import os
 import disnake
 from disnake.ext import commands
+from storage import Storage, DEFAULT_PATH, DEFAULT_PROFILE
 
 TOKEN = os.getenv("TOKEN")
+DB_PATH = os.getenv("DB_PATH", DEFAULT_PATH)
+DB_PROFILE = os.getenv("DB_PROFILE", DEFAULT_PROFILE)
 
-bot = commands.Bot(command_prefix=".", intents=disnake.Intents.all(), help_command=None)
+class Bot(commands.Bot):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Одно хранилище на все коги
+        self.storage = Storage(DB_PATH, profile=DB_PROFILE)
+        # Задачи, которые коги запускают при выгрузке; выключение их дожидается
+        self.shutdown_tasks = set()
+
+    async def close(self):
+        await super().close()
+        await asyncio.gather(*self.shutdown_tasks, return_exceptions=True)
+        await self.storage.close()
+
+bot = Bot(command_prefix=".", intents=disnake.Intents.all(), help_command=None)
 
 @bot.event
 async def on_ready():
     await bot.change_presence(activity=disnake.Activity(type=disnake.ActivityType.playing, name="Minecraft | Сервер: AquaLand"), status=disnake.Status.dnd)
     print(f"Logged in as {bot.user.name}")
 
+    # Схема базы должна быть актуальной до загрузки когов
+    await bot.storage.open()
+
     bot.load_extensions("cogs")
 
 bot.run(TOKEN)
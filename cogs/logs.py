@@ -1,77 +1,174 @@
+import asyncio
+import aiohttp
 import disnake
 from disnake.ext import commands
-import aiosqlite
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from dataclasses import replace
+from storage import LogSettings
+from utils.auditlog import AuditLogCache
+from utils.durations import format_duration
+from utils.logqueue import GONE, LogQueue
+from utils.messagecache import MessageCache
+from utils.voicesessions import VoiceSessions
 
 class Logs(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.path = "v1rago/dbs/file.db"
+        self.db = bot.storage
+        # Строка таблицы logs для каждого сервера; обновляется сквозной записью
+        self.settings = {}
+        # Журнал аудита приходит событием, а не запросом на каждое действие
+        self.audit = AuditLogCache()
+        # Эмбеды копятся по каналам и уходят пачками; глубина - self.queue.depth
+        self.queue = LogQueue(on_gone=self.webhook_gone)
+        # Вебхуки логов по серверам и одна HTTP-сессия на все вебхуки.
+        # У вебхуков свои лимиты запросов, они не отнимают лимиты бота на отправку в каналы
+        self.webhooks = {}
+        # ID вебхука -> сервер: в очереди могут остаться пачки уже сброшенного вебхука
+        self.webhook_guilds = {}
+        self.session = None
+        # Вместо эмбеда на каждый вход и переход - одна сводка на голосовую сессию
+        self.voice = VoiceSessions(self.finish_voice_session)
+        # Содержимое сообщений для логов удаления и правки, не зависит от кэша disnake
+        self.messages = MessageCache()
 
-    async def init_db(self):
-        async with aiosqlite.connect(self.path) as db:
-            await db.execute("""CREATE TABLE IF NOT EXISTS logs (
-                guild_id INTEGER PRIMARY KEY,
-                channel_id INTEGER DEFAULT NULL,
-                log_messages INTEGER DEFAULT 1,
-                log_moderation INTEGER DEFAULT 1,
-                log_voice INTEGER DEFAULT 1,
-                log_members INTEGER DEFAULT 1,
-                log_tickets INTEGER DEFAULT 1
-            )""")
-            await db.commit()
+    async def cog_load(self):
+        # setdefault: не затираем то, что успели записать, пока шла загрузка
+        for settings in await self.db.select(LogSettings):
+            self.settings.setdefault(settings.guild_id, settings)
+        self.voice.start()
+
+    def cog_unload(self):
+        self.queue.close()
+        self.voice.stop()
+        if self.session:
+            # cog_unload синхронный - закрытие сессии дожидается бот при выключении
+            task = asyncio.create_task(self.session.close())
+            self.bot.shutdown_tasks.add(task)
+            task.add_done_callback(self.bot.shutdown_tasks.discard)
+
+    def get_session(self):
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+        return self.session
+
+    def get_webhook(self, settings):
+        webhook = self.webhooks.get(settings.guild_id)
+        if webhook is None:
+            webhook = self.webhooks[settings.guild_id] = disnake.Webhook.from_url(settings.webhook_url, session=self.get_session())
+            self.webhook_guilds[webhook.id] = settings.guild_id
+        return webhook
+
+    async def webhook_alive(self, webhook_url):
+        """Вебхук существует и его токен действителен"""
+        try:
+            await disnake.Webhook.from_url(webhook_url, session=self.get_session()).fetch(prefer_auth=False)
+        except disnake.HTTPException as e:
+            if e.status in GONE:
+                return False
+            raise
+        return True
+
+    async def webhook_gone(self, target, batch):
+        """Вебхук удален или сброшен: забываем его и отправляем логи в канал"""
+        guild_id = self.webhook_guilds.get(getattr(target, "id", None)) if isinstance(target, disnake.Webhook) else None
+        if guild_id is None:
+            return False
+        
+        if self.webhooks.get(guild_id) is target:
+            # Вебхук еще в настройках - убираем его, следующие логи пойдут в канал
+            print(f"Вебхук логов сервера {guild_id} недоступен, логи переключены на канал")
+            del self.webhooks[guild_id]
+            await self.save_settings(guild_id, webhook_url=None)
+        
+        guild = self.bot.get_guild(guild_id)
+        channel = guild and guild.get_channel(await self.get_log_channel(guild_id))
+        if channel is None:
+            return False
+        for embed in batch:
+            self.queue.send(channel, embed)
+        return True
+
+    async def get_settings(self, guild_id):
+        settings = self.settings.get(guild_id)
+        if settings is None:
+            # Сервер без строки в базе получает настройки по умолчанию
+            settings = await self.db.get(LogSettings, "WHERE guild_id = ?", (guild_id,)) or LogSettings(guild_id)
+            self.settings[guild_id] = settings
+        return settings
+
+    async def save_settings(self, guild_id, **fields):
+        """Записать настройки в базу и сразу обновить кэш"""
+        columns = ", ".join(fields)
+        placeholders = ", ".join("?" for _ in fields)
+        updates = ", ".join(f"{name} = excluded.{name}" for name in fields)
+        await self.db.execute(
+            f"""INSERT INTO logs (guild_id, {columns}) VALUES (?, {placeholders})
+            ON CONFLICT(guild_id) DO UPDATE SET {updates}""",
+            (guild_id, *fields.values())
+        )
+        self.settings[guild_id] = replace(await self.get_settings(guild_id), **fields)
 
     async def get_log_channel(self, guild_id):
-        async with aiosqlite.connect(self.path) as db:
-            result = await db.execute("SELECT channel_id FROM logs WHERE guild_id = ?", (guild_id,)).fetchone()
-            return result[0] if result else None
+        return (await self.get_settings(guild_id)).channel_id
 
     async def get_log_settings(self, guild_id, log_type):
         """Получить настройки логов для конкретного типа"""
-        async with aiosqlite.connect(self.path) as db:
-            result = await db.execute(f"SELECT {log_type} FROM logs WHERE guild_id = ?", (guild_id,)).fetchone()
-            return result[0] if result else 1
+        return getattr(await self.get_settings(guild_id), log_type)
 
     async def log_event(self, guild, embed):
-        channel_id = await self.get_log_channel(guild.id)
+        settings = await self.get_settings(guild.id)
+        if settings.output == "webhook" and settings.webhook_url:
+            self.queue.send(self.get_webhook(settings), embed)
+            return
+        
+        channel_id = settings.channel_id
         if channel_id:
             channel = guild.get_channel(channel_id)
             if channel:
-                try:
-                    await channel.send(embed=embed)
-                except:
-                    pass
+                self.queue.send(channel, embed)
 
     async def get_moderator_from_db(self, guild_id, user_id, action_type, duration=None):
         """Получить информацию о модераторе из базы данных наказаний"""
-        async with aiosqlite.connect(self.path) as db:
-            # Проверяем таблицу warnings для предупреждений
-            if action_type == "warn":
-                warn = await db.execute(
-                    "SELECT moderator_id FROM warnings WHERE user_id = ? AND active = 'true' ORDER BY id DESC LIMIT 1",
-                    (user_id,)
-                ).fetchone()
-                if warn:
-                    return warn[0]
-            
-            # Для других действий проверяем по времени или другим критериям
-            # Добавьте логику для других типов наказаний
-            
+        # Проверяем таблицу warnings для предупреждений
+        if action_type == "warn":
+            warn = await self.db.fetchone(
+                "SELECT moderator_id FROM warnings WHERE user_id = ? AND active = 'true' ORDER BY id DESC LIMIT 1",
+                (user_id,)
+            )
+            if warn:
+                return warn[0]
+        
+        # Для других действий проверяем по времени или другим критериям
+        # Добавьте логику для других типов наказаний
+        
         return None
 
-    @commands.Cog.listener()
-    async def on_ready(self):
-        await self.init_db()
-
     @commands.slash_command(name="setup_logs", description="Настроить канал для логов")
     @commands.has_permissions(administrator=True)
     async def setup_logs(self, inter: disnake.ApplicationCommandInteraction,
-                         channel: disnake.TextChannel = commands.Param(description="Канал для логов")):
-        async with aiosqlite.connect(self.path) as db:
-            await db.execute("INSERT OR REPLACE INTO logs (guild_id, channel_id) VALUES (?, ?)", (inter.guild.id, channel.id))
-            await db.commit()
+                         channel: disnake.TextChannel = commands.Param(description="Канал для логов"),
+                         output: str = commands.Param(description="Способ отправки", default="channel",
+                                                      choices={"Сообщения бота": "channel", "Вебхук канала": "webhook"})):
+        settings = await self.get_settings(inter.guild.id)
+        # Уже созданный вебхук годится только для того же канала и только если его не удалили
+        webhook_url = settings.webhook_url if channel.id == settings.channel_id else None
+        if output == "webhook" and webhook_url and not await self.webhook_alive(webhook_url):
+            webhook_url = None
+        
+        if output == "webhook" and not webhook_url:
+            try:
+                webhook = await channel.create_webhook(name="Логи")
+            except disnake.HTTPException:
+                await inter.response.send_message("❌ Не удалось создать вебхук: нужно право «Управлять вебхуками».", ephemeral=True)
+                return
+            webhook_url = webhook.url
         
-        embed = disnake.Embed(title="📝 Логи настроены", description=f"Логи будут отправляться в {channel.mention}", color=0x00ff00)
+        self.webhooks.pop(inter.guild.id, None)
+        await self.save_settings(inter.guild.id, channel_id=channel.id, output=output, webhook_url=webhook_url)
+        
+        via = " через вебхук" if output == "webhook" else ""
+        embed = disnake.Embed(title="📝 Логи настроены", description=f"Логи будут отправляться в {channel.mention}{via}", color=0x00ff00)
         await inter.response.send_message(embed=embed, ephemeral=True)
 
     @commands.slash_command(name="log_settings", description="Настройки логов")
@@ -82,12 +179,8 @@ class Logs(commands.Cog):
                            voice: bool = commands.Param(default=True, description="Логировать голосовые"),
                            members: bool = commands.Param(default=True, description="Логировать участников"),
                            tickets: bool = commands.Param(default=True, description="Логировать тикеты")):
-        async with aiosqlite.connect(self.path) as db:
-            await db.execute("""INSERT OR REPLACE INTO logs 
-                             (guild_id, log_messages, log_moderation, log_voice, log_members, log_tickets) 
-                             VALUES (?, ?, ?, ?, ?, ?)""", 
-                           (inter.guild.id, int(messages), int(moderation), int(voice), int(members), int(tickets)))
-            await db.commit()
+        await self.save_settings(inter.guild.id, log_messages=int(messages), log_moderation=int(moderation),
+                                 log_voice=int(voice), log_members=int(members), log_tickets=int(tickets))
         
         embed = disnake.Embed(title="⚙️ Настройки логов", color=0x00ff00)
         embed.add_field(name="Сообщения", value="✅" if messages else "❌")
@@ -97,6 +190,10 @@ class Logs(commands.Cog):
         embed.add_field(name="Тикеты", value="✅" if tickets else "❌")
         await inter.response.send_message(embed=embed, ephemeral=True)
 
+    @commands.Cog.listener()
+    async def on_audit_log_entry_create(self, entry):
+        self.audit.add(entry)
+
     # Логирование модерации
     @commands.Cog.listener()
     async def on_member_ban(self, guild, user):
@@ -104,11 +201,10 @@ class Logs(commands.Cog):
             return
         
         # Получаем информацию о модераторе из аудита
-        async for entry in guild.audit_logs(action=disnake.AuditLogAction.ban, limit=5):
-            if entry.target.id == user.id:
-                moderator = entry.user
-                reason = entry.reason or "Не указана"
-                break
+        entry = await self.audit.find(guild.id, disnake.AuditLogAction.ban, user.id)
+        if entry:
+            moderator = entry.user
+            reason = entry.reason or "Не указана"
         else:
             moderator = self.bot.user
             reason = "Неизвестно"
@@ -126,11 +222,10 @@ class Logs(commands.Cog):
             return
         
         # Получаем информацию о модераторе из аудита
-        async for entry in guild.audit_logs(action=disnake.AuditLogAction.unban, limit=5):
-            if entry.target.id == user.id:
-                moderator = entry.user
-                reason = entry.reason or "Не указана"
-                break
+        entry = await self.audit.find(guild.id, disnake.AuditLogAction.unban, user.id)
+        if entry:
+            moderator = entry.user
+            reason = entry.reason or "Не указана"
         else:
             moderator = self.bot.user
             reason = "Неизвестно"
@@ -147,22 +242,22 @@ class Logs(commands.Cog):
             return
         
         # Проверяем, был ли это кик
-        async for entry in member.guild.audit_logs(action=disnake.AuditLogAction.kick, limit=5):
-            if entry.target.id == member.id:
-                # Это был кик
-                if await self.get_log_settings(member.guild.id, "log_moderation") == 0:
-                    return
-                
-                moderator = entry.user
-                reason = entry.reason or "Не указана"
-                
-                embed = disnake.Embed(title="👢 Кик", color=0xff9900, timestamp=datetime.now())
-                embed.add_field(name="Пользователь", value=f"{member} ({member.id})", inline=False)
-                embed.add_field(name="Модератор", value=f"{moderator.mention} ({moderator.id})", inline=False)
-                embed.add_field(name="Причина", value=reason, inline=False)
-                embed.set_thumbnail(url=member.display_avatar.url)
-                await self.log_event(member.guild, embed)
+        entry = await self.audit.find(member.guild.id, disnake.AuditLogAction.kick, member.id)
+        if entry:
+            # Это был кик
+            if await self.get_log_settings(member.guild.id, "log_moderation") == 0:
                 return
+            
+            moderator = entry.user
+            reason = entry.reason or "Не указана"
+            
+            embed = disnake.Embed(title="👢 Кик", color=0xff9900, timestamp=datetime.now())
+            embed.add_field(name="Пользователь", value=f"{member} ({member.id})", inline=False)
+            embed.add_field(name="Модератор", value=f"{moderator.mention} ({moderator.id})", inline=False)
+            embed.add_field(name="Причина", value=reason, inline=False)
+            embed.set_thumbnail(url=member.display_avatar.url)
+            await self.log_event(member.guild, embed)
+            return
         
         # Если не кик, то просто выход
         embed = disnake.Embed(title="👋 Участник вышел", color=0xff9900, timestamp=datetime.now())
@@ -176,29 +271,32 @@ class Logs(commands.Cog):
             if await self.get_log_settings(after.guild.id, "log_moderation") == 0:
                 return
             
-            # Мьют был изменен
-            async for entry in after.guild.audit_logs(action=disnake.AuditLogAction.member_update, limit=10):
-                if entry.target.id == after.id and hasattr(entry.after, 'timed_out_until'):
-                    moderator = entry.user
-                    reason = entry.reason or "Не указана"
-                    
-                    embed = disnake.Embed(
-                        title="🔇 Мьют" if after.timed_out_until else "🔊 Размьют",
-                        color=0xff9900 if after.timed_out_until else 0x00ff00,
-                        timestamp=datetime.now()
-                    )
-                    embed.add_field(name="Пользователь", value=f"{after.mention} ({after.id})", inline=False)
-                    embed.add_field(name="Модератор", value=f"{moderator.mention} ({moderator.id})", inline=False)
-                    embed.add_field(name="Причина", value=reason, inline=False)
-                    
-                    if after.timed_out_until:
-                        duration = after.timed_out_until - datetime.now(datetime.timezone.utc)
-                        hours = int(duration.total_seconds() // 3600)
-                        minutes = int((duration.total_seconds() % 3600) // 60)
-                        embed.add_field(name="Длительность", value=f"{hours}ч {minutes}м", inline=False)
-                    
-                    await self.log_event(after.guild, embed)
-                    break
+            # Мьют был изменен; в журнале аудита communication_disabled_until называется timeout,
+            # при снятии мьюта поле может быть только в before
+            entry = await self.audit.find(
+                after.guild.id, disnake.AuditLogAction.member_update, after.id,
+                check=lambda entry: hasattr(entry.after, "timeout") or hasattr(entry.before, "timeout")
+            )
+            if entry:
+                moderator = entry.user
+                reason = entry.reason or "Не указана"
+                
+                embed = disnake.Embed(
+                    title="🔇 Мьют" if after.timed_out_until else "🔊 Размьют",
+                    color=0xff9900 if after.timed_out_until else 0x00ff00,
+                    timestamp=datetime.now()
+                )
+                embed.add_field(name="Пользователь", value=f"{after.mention} ({after.id})", inline=False)
+                embed.add_field(name="Модератор", value=f"{moderator.mention} ({moderator.id})", inline=False)
+                embed.add_field(name="Причина", value=reason, inline=False)
+                
+                if after.timed_out_until:
+                    duration = after.timed_out_until - datetime.now(timezone.utc)
+                    hours = int(duration.total_seconds() // 3600)
+                    minutes = int((duration.total_seconds() % 3600) // 60)
+                    embed.add_field(name="Длительность", value=f"{hours}ч {minutes}м", inline=False)
+                
+                await self.log_event(after.guild, embed)
 
     @commands.Cog.listener()
     async def on_member_join(self, member):
@@ -209,92 +307,159 @@ class Logs(commands.Cog):
         embed.add_field(name="Пользователь", value=f"{member.mention} ({member.id})", inline=False)
         embed.add_field(name="Аккаунт создан", value=member.created_at.strftime("%d.%m.%Y %H:%M"), inline=False)
         
-        # Проверяем, был ли участник ранее на сервере
-        async for entry in member.guild.audit_logs(action=disnake.AuditLogAction.bot_add, limit=5):
-            if entry.target.id == member.id:
-                embed.add_field(name="Приглашен", value=f"через интеграцию", inline=False)
-                break
+        # Через интеграцию добавляются только боты
+        if member.bot and await self.audit.find(member.guild.id, disnake.AuditLogAction.bot_add, member.id):
+            embed.add_field(name="Приглашен", value=f"через интеграцию", inline=False)
         
         embed.set_thumbnail(url=member.display_avatar.url)
         await self.log_event(member.guild, embed)
 
     # Логирование сообщений
     @commands.Cog.listener()
-    async def on_message_delete(self, message):
-        if message.author.bot:
+    async def on_message(self, message):
+        if message.guild and not message.author.bot:
+            self.messages.add(message)
+
+    def cached(self, payload):
+        """Сообщение из нашего кэша, иначе из кэша disnake; None, если его нет нигде"""
+        message = self.messages.get(payload.message_id)
+        if message is None and payload.cached_message and not payload.cached_message.author.bot:
+            self.messages.add(payload.cached_message)
+            message = self.messages.get(payload.message_id)
+        return message
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        message = self.cached(payload)
+        self.messages.discard(payload.message_id)
+        if message is None or payload.guild_id is None:
             return
         
-        if await self.get_log_settings(message.guild.id, "log_messages") == 0:
+        if await self.get_log_settings(payload.guild_id, "log_messages") == 0:
             return
         
-        # Проверяем, было ли это удаление модератором
-        async for entry in message.guild.audit_logs(action=disnake.AuditLogAction.message_delete, limit=5):
-            if entry.extra.channel.id == message.channel.id and entry.created_at.timestamp() > datetime.now().timestamp() - 2:
-                moderator = entry.user
-                break
-        else:
-            moderator = message.author  # Самоудаление
+        guild = self.bot.get_guild(payload.guild_id)
+        if guild is None:
+            return
+        
+        # Проверяем, было ли это удаление модератором (цель записи - автор сообщения)
+        entry = await self.audit.find(
+            payload.guild_id, disnake.AuditLogAction.message_delete, message.author_id, max_age=5,
+            check=lambda entry: entry.extra.channel.id == message.channel_id
+        )
         
         embed = disnake.Embed(title="🗑️ Сообщение удалено", color=0xff0000, timestamp=datetime.now())
-        embed.add_field(name="Автор", value=f"{message.author.mention} ({message.author.id})", inline=False)
-        embed.add_field(name="Канал", value=message.channel.mention, inline=False)
+        embed.add_field(name="Автор", value=f"<@{message.author_id}> ({message.author_id})", inline=False)
+        embed.add_field(name="Канал", value=f"<#{message.channel_id}>", inline=False)
         
-        if moderator != message.author:
-            embed.add_field(name="Удалил", value=f"{moderator.mention} ({moderator.id})", inline=False)
+        # Иначе самоудаление
+        if entry and entry.user.id != message.author_id:
+            embed.add_field(name="Удалил", value=f"{entry.user.mention} ({entry.user.id})", inline=False)
         
         if message.content:
-            content = message.content[:1000] + "..." if len(message.content) > 1000 else message.content
+            content = message.content + "..." if len(message.content) >= self.messages.max_content else message.content
             embed.add_field(name="Содержимое", value=content, inline=False)
         
         if message.attachments:
-            files = "\n".join([f"[{att.filename}]({att.url})" for att in message.attachments[:3]])
-            embed.add_field(name="Вложения", value=files, inline=False)
+            embed.add_field(name="Вложения", value="\n".join(message.attachments[:3]), inline=False)
         
-        await self.log_event(message.guild, embed)
+        await self.log_event(guild, embed)
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload):
+        for message_id in payload.message_ids:
+            self.messages.discard(message_id)
 
     @commands.Cog.listener()
-    async def on_message_edit(self, before, after):
-        if before.author.bot or before.content == after.content:
+    async def on_raw_message_edit(self, payload):
+        # Правки без поля content - это, например, подгрузка превью ссылок
+        if "content" not in payload.data:
+            return
+        
+        before = self.cached(payload)
+        if before is None or payload.guild_id is None:
+            return
+        
+        after_content = payload.data["content"]
+        if before.content == after_content[:self.messages.max_content]:
+            return
+        self.messages.put(before.id, before.channel_id, before.author_id, after_content, before.attachments)
+        
+        if await self.get_log_settings(payload.guild_id, "log_messages") == 0:
             return
         
-        if await self.get_log_settings(before.guild.id, "log_messages") == 0:
+        guild = self.bot.get_guild(payload.guild_id)
+        if guild is None:
             return
         
         embed = disnake.Embed(title="📝 Сообщение изменено", color=0xffff00, timestamp=datetime.now())
-        embed.add_field(name="Автор", value=f"{before.author.mention} ({before.author.id})", inline=False)
-        embed.add_field(name="Канал", value=before.channel.mention, inline=False)
+        embed.add_field(name="Автор", value=f"<@{before.author_id}> ({before.author_id})", inline=False)
+        embed.add_field(name="Канал", value=f"<#{before.channel_id}>", inline=False)
         
         before_content = before.content[:500] or "Пусто"
-        after_content = after.content[:500] or "Пусто"
+        after_content = after_content[:500] or "Пусто"
         
         embed.add_field(name="Было", value=before_content, inline=False)
         embed.add_field(name="Стало", value=after_content, inline=False)
-        embed.add_field(name="Ссылка", value=f"[Перейти]({after.jump_url})", inline=False)
+        jump_url = f"https://discord.com/channels/{payload.guild_id}/{before.channel_id}/{before.id}"
+        embed.add_field(name="Ссылка", value=f"[Перейти]({jump_url})", inline=False)
         
-        await self.log_event(before.guild, embed)
+        await self.log_event(guild, embed)
 
     # Логирование голосовых
     @commands.Cog.listener()
     async def on_voice_state_update(self, member, before, after):
-        if await self.get_log_settings(member.guild.id, "log_voice") == 0:
+        if before.channel != after.channel:
+            self.voice.update(member, before.channel, after.channel)
+
+    async def finish_voice_session(self, session):
+        """Сессия завершена: сохраняем ее и отправляем одну сводку"""
+        path = " → ".join(session.channels())
+        self.db.append_nowait(
+            """INSERT INTO voice_sessions (guild_id, user_id, channel_path, started_at, ended_at, duration)
+            VALUES (?, ?, ?, ?, ?, ?)""",
+            (session.guild.id, session.member.id, path,
+             datetime.fromtimestamp(session.started).strftime("%Y-%m-%d %H:%M:%S"),
+             datetime.fromtimestamp(session.ended).strftime("%Y-%m-%d %H:%M:%S"),
+             int(session.duration))
+        )
+        
+        if await self.get_log_settings(session.guild.id, "log_voice") == 0:
             return
         
-        if before.channel != after.channel:
-            embed = disnake.Embed(title="🔊 Голосовой статус", color=0x00aaff, timestamp=datetime.now())
-            embed.add_field(name="Участник", value=f"{member.mention} ({member.id})", inline=False)
-            
-            if before.channel and not after.channel:
-                embed.description = "🔇 Вышел из голосового"
-                embed.add_field(name="Канал", value=before.channel.name, inline=False)
-            elif not before.channel and after.channel:
-                embed.description = "🎤 Вошел в голосовой"
-                embed.add_field(name="Канал", value=after.channel.name, inline=False)
-            elif before.channel and after.channel:
-                embed.description = "🔄 Перешел в другой канал"
-                embed.add_field(name="Из канала", value=before.channel.name, inline=False)
-                embed.add_field(name="В канал", value=after.channel.name, inline=False)
-            
-            await self.log_event(member.guild, embed)
+        member = session.member
+        embed = disnake.Embed(title="🔊 Голосовая сессия", color=0x00aaff, timestamp=datetime.now())
+        embed.add_field(name="Участник", value=f"{member.mention} ({member.id})", inline=False)
+        embed.add_field(name="Длительность", value=format_duration(session.duration), inline=True)
+        embed.add_field(name="Начало", value=f"<t:{int(session.started)}:t>", inline=True)
+        embed.add_field(name="Каналы", value=path if len(path) <= 1024 else path[:1021] + "...", inline=False)
+        await self.log_event(session.guild, embed)
+
+    @commands.slash_command(name="voice_stats", description="Время в голосовых каналах")
+    async def voice_stats(self, inter: disnake.ApplicationCommandInteraction,
+                          member: disnake.Member = commands.Param(description="Участник (пусто - топ сервера)", default=None),
+                          days: int = commands.Param(description="За сколько дней", default=30, ge=1, le=365)):
+        since = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+        embed = disnake.Embed(title=f"🎧 Голосовые каналы за {days} дн.", color=0x00aaff)
+        
+        if member:
+            total, sessions = await self.db.fetchone(
+                "SELECT IFNULL(SUM(duration), 0), COUNT(*) FROM voice_sessions WHERE guild_id = ? AND user_id = ? AND started_at >= ?",
+                (inter.guild.id, member.id, since)
+            )
+            embed.description = f"{member.mention}: {format_duration(total)}, сессий: {sessions}"
+        else:
+            top = await self.db.fetchall(
+                """SELECT user_id, SUM(duration) AS total FROM voice_sessions
+                WHERE guild_id = ? AND started_at >= ?
+                GROUP BY user_id ORDER BY total DESC LIMIT 10""",
+                (inter.guild.id, since)
+            )
+            embed.description = "\n".join(
+                f"{place}. <@{user_id}>: {format_duration(total)}" for place, (user_id, total) in enumerate(top, 1)
+            ) or "Пока нет данных"
+        
+        await inter.response.send_message(embed=embed, ephemeral=True)
 
     # Логирование тикетов
     async def log_ticket_event(self, guild, ticket_author, moderator, action, reason=None):
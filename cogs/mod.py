@@ -1,82 +1,45 @@
 import disnake
 from disnake.ext import commands
-import aiosqlite
 import datetime
 from datetime import timedelta
+from storage import Warn, Punishment
 
 class Moderation(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.path = "v1rago/dbs/file.db"
-
-    async def init_db(self):
-        async with aiosqlite.connect(self.path) as db:
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS warnings (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    moderator_id INTEGER NOT NULL,
-                    reason TEXT,
-                    time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    active TEXT DEFAULT "true"
-                )""")
-            
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS punishments (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    moderator_id INTEGER NOT NULL,
-                    action_type TEXT NOT NULL,
-                    duration TEXT,
-                    reason TEXT,
-                    time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    guild_id INTEGER NOT NULL
-                )""")
-            await db.commit()
+        self.db = bot.storage
 
     async def warn_user(self, user_id: int, moderator_id: int, reason: str = None):
-        async with aiosqlite.connect(self.path) as db:
-            cursor = await db.execute(
-                "INSERT INTO warnings (user_id, moderator_id, reason) VALUES (?, ?, ?)", 
-                (user_id, moderator_id, reason)
-            )
-            await db.commit()
-            return cursor.lastrowid
+        return await self.db.append(
+            "INSERT INTO warnings (user_id, moderator_id, reason) VALUES (?, ?, ?)", 
+            (user_id, moderator_id, reason)
+        )
 
     async def log_punishment(self, guild_id: int, user_id: int, moderator_id: int, action_type: str, duration: str = None, reason: str = None):
-        """Логировать наказание в базу данных"""
-        async with aiosqlite.connect(self.path) as db:
-            await db.execute(
-                """INSERT INTO punishments (guild_id, user_id, moderator_id, action_type, duration, reason) 
-                VALUES (?, ?, ?, ?, ?, ?)""",
-                (guild_id, user_id, moderator_id, action_type, duration, reason)
-            )
-            await db.commit()
+        """Логировать наказание в базу данных (запись уходит в групповой коммит)"""
+        self.db.append_nowait(
+            """INSERT INTO punishments (guild_id, user_id, moderator_id, action_type, duration, reason) 
+            VALUES (?, ?, ?, ?, ?, ?)""",
+            (guild_id, user_id, moderator_id, action_type, duration, reason)
+        )
 
     async def unwarn_user(self, user_id: int, by_moderator: bool = False, warn_id: int = None):
-        async with aiosqlite.connect(self.path) as db:
-            if by_moderator:
-                if warn_id:
-                    await db.execute("UPDATE warnings SET active = 'false' WHERE id = ? AND user_id = ?", 
-                                    (warn_id, user_id))
-                else:
-                    await db.execute("UPDATE warnings SET active = 'false' WHERE user_id = ? AND active = 'true'", 
-                                    (user_id,))
-                await db.commit()
-                return True
-            return False
+        if by_moderator:
+            if warn_id:
+                await self.db.execute("UPDATE warnings SET active = 'false' WHERE id = ? AND user_id = ?", 
+                                      (warn_id, user_id))
+            else:
+                await self.db.execute("UPDATE warnings SET active = 'false' WHERE user_id = ? AND active = 'true'", 
+                                      (user_id,))
+            return True
+        return False
 
     async def get_warnings_count(self, user_id: int):
-        async with aiosqlite.connect(self.path) as db:
-            count = await db.execute(
-                "SELECT COUNT(*) FROM warnings WHERE user_id = ? AND active = 'true'", 
-                (user_id,)
-            ).fetchone()
-            return count[0] if count else 0
-
-    @commands.Cog.listener()
-    async def on_ready(self):
-        await self.init_db()
+        count = await self.db.fetchone(
+            "SELECT COUNT(*) FROM warnings WHERE user_id = ? AND active = 'true'", 
+            (user_id,)
+        )
+        return count[0] if count else 0
 
     @commands.slash_command(name="mute", description="Выдать мьют пользователю на сервере.")
     @commands.has_permissions(mute_members=True)
@@ -376,12 +339,10 @@ class Moderation(commands.Cog):
     async def warnings(self, inter: disnake.ApplicationCommandInteraction,
                        user: disnake.Member = commands.Param(description="Выберите пользователя.")):
         
-        async with aiosqlite.connect(self.path) as db:
-            warnings = await db.execute(
-                """SELECT id, moderator_id, reason, time FROM warnings 
-                WHERE user_id = ? AND active = 'true' ORDER BY time DESC""", 
-                (user.id,)
-            ).fetchall()
+        warnings = await self.db.select(
+            Warn, "WHERE user_id = ? AND active = 'true' ORDER BY time DESC", 
+            (user.id,)
+        )
         
         if not warnings:
             embed = disnake.Embed(
@@ -398,11 +359,11 @@ class Moderation(commands.Cog):
             color=disnake.Color.orange()
         )
         
-        for warn_id, moderator_id, reason, time in warnings[:10]:
-            moderator = inter.guild.get_member(moderator_id) or f"ID: {moderator_id}"
+        for warn in warnings[:10]:
+            moderator = inter.guild.get_member(warn.moderator_id) or f"ID: {warn.moderator_id}"
             embed.add_field(
-                name=f"ID: {warn_id} | {time}",
-                value=f"**Модератор:** {moderator}\n**Причина:** {reason}",
+                name=f"ID: {warn.id} | {warn.time}",
+                value=f"**Модератор:** {moderator}\n**Причина:** {warn.reason}",
                 inline=False
             )
         
@@ -413,12 +374,10 @@ class Moderation(commands.Cog):
     async def punishments(self, inter: disnake.ApplicationCommandInteraction,
                           user: disnake.Member = commands.Param(description="Выберите пользователя.")):
         
-        async with aiosqlite.connect(self.path) as db:
-            punishments = await db.execute(
-                """SELECT action_type, moderator_id, duration, reason, time FROM punishments 
-                WHERE user_id = ? AND guild_id = ? ORDER BY time DESC LIMIT 20""", 
-                (user.id, inter.guild.id)
-            ).fetchall()
+        punishments = await self.db.select(
+            Punishment, "WHERE user_id = ? AND guild_id = ? ORDER BY time DESC LIMIT 20", 
+            (user.id, inter.guild.id)
+        )
         
         if not punishments:
             embed = disnake.Embed(
@@ -435,20 +394,20 @@ class Moderation(commands.Cog):
             color=disnake.Color.blue()
         )
         
-        for action_type, moderator_id, duration, reason, time in punishments:
-            moderator = inter.guild.get_member(moderator_id) or f"ID: {moderator_id}"
+        for punishment in punishments:
+            moderator = inter.guild.get_member(punishment.moderator_id) or f"ID: {punishment.moderator_id}"
             action_emoji = {
                 "mute": "🔇", "unmute": "🔊", "kick": "👢", 
                 "ban": "🚫", "unban": "✅", "warn": "⚠️", 
                 "unwarn": "✅", "clear": "🗑️"
-            }.get(action_type, "📝")
+            }.get(punishment.action_type, "📝")
             
-            value = f"**Модератор:** {moderator}\n**Причина:** {reason}"
-            if duration:
-                value += f"\n**Длительность:** {duration}"
+            value = f"**Модератор:** {moderator}\n**Причина:** {punishment.reason}"
+            if punishment.duration:
+                value += f"\n**Длительность:** {punishment.duration}"
             
             embed.add_field(
-                name=f"{action_emoji} {action_type.upper()} | {time}",
+                name=f"{action_emoji} {punishment.action_type.upper()} | {punishment.time}",
                 value=value,
                 inline=False
             )
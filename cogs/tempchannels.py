@@ -1,159 +1,173 @@
 import disnake
 from disnake.ext import commands
 from disnake.ui import Modal, TextInput
-import aiosqlite
 import asyncio
+from storage import TempChannelSetup, TempVoice
+
+# Виды записей в tempvoice_members
+BANNED = "ban"
+DEAFENED = "deafen"
 
 class TempVoices(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.path = "v1rago/dbs/file.db"
+        self.db = bot.storage
+        # Сервер -> (материнский канал, категория, канал настроек); без похода в базу на каждый вход
+        self.setups = {}
 
-    async def init_db(self):
-        async with aiosqlite.connect(self.path) as db:
-            await db.execute("""CREATE TABLE IF NOT EXISTS tempchannels (
-                            guild_id INTEGER PRIMARY KEY,
-                            category_id INTEGER DEFAULT NULL,
-                            settings_channel_id INTEGER DEFAULT NULL,
-                            mother_channel_id INTEGER DEFAULT NULL
-                            )""")
-            await db.execute("""CREATE TABLE IF NOT EXISTS tempvoiceusers (
-                             creator_id INTEGER PRIMARY KEY,
-                             channel_id INTEGER,
-                             owner_id INTEGER,
-                             max_users INTEGER DEFAULT NULL,
-                             is_private TEXT DEFAULT "true",
-                             name TEXT,
-                             bitrate INTEGER DEFAULT 64000,
-                             banned_users_ids TEXT DEFAULT NULL,
-                             deafened_users_ids TEXT DEFAULT NULL
-                             )""")
-            await db.commit()
+    async def cog_load(self):
+        for setup in await self.db.select(TempChannelSetup):
+            self.setups.setdefault(setup.guild_id, setup)
 
     @commands.Cog.listener()
     async def on_ready(self):
-        await self.init_db()
         print(f"Ког {self.__class__.__name__} загружен!")
 
     async def edit_settings(self, creator_id, **kwargs):
-        async with aiosqlite.connect(self.path) as db:
-            # Обновляем только переданные поля
-            if kwargs:
-                set_clause = ", ".join([f"{key} = ?" for key in kwargs.keys()])
-                values = list(kwargs.values())
-                values.append(creator_id)
-                await db.execute(f"UPDATE tempvoiceusers SET {set_clause} WHERE creator_id = ?", values)
-                await db.commit()
+        # Обновляем только переданные поля
+        if kwargs:
+            set_clause = ", ".join([f"{key} = ?" for key in kwargs.keys()])
+            values = list(kwargs.values())
+            values.append(creator_id)
+            await self.db.execute(f"UPDATE tempvoiceusers SET {set_clause} WHERE creator_id = ?", values)
 
     async def create_temp_voice(self, creator_id, channel_id, owner_id=None, **kwargs):
-        async with aiosqlite.connect(self.path) as db:
-            owner_id = owner_id or creator_id
-            await db.execute("""INSERT OR REPLACE INTO tempvoiceusers 
-                              (creator_id, channel_id, owner_id, max_users, is_private, name, bitrate, banned_users_ids, deafened_users_ids) 
-                              VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""", 
+        owner_id = owner_id or creator_id
+        await self.db.append("""INSERT OR REPLACE INTO tempvoiceusers 
+                              (creator_id, channel_id, owner_id, max_users, is_private, name, bitrate) 
+                              VALUES (?, ?, ?, ?, ?, ?, ?)""", 
                             (creator_id, channel_id, owner_id, 
                              kwargs.get('max_users'), kwargs.get('is_private', 'true'),
-                             kwargs.get('name'), kwargs.get('bitrate', 64000),
-                             kwargs.get('banned_users_ids'), kwargs.get('deafened_users_ids')))
-            await db.commit()
+                             kwargs.get('name'), kwargs.get('bitrate', 64000)))
 
     async def get_temp_voice(self, creator_id):
-        async with aiosqlite.connect(self.path) as db:
-            voice = await db.execute("SELECT * FROM tempvoiceusers WHERE creator_id = ?", (creator_id,)).fetchone()
-            return voice
+        return await self.db.get(TempVoice, "WHERE creator_id = ?", (creator_id,))
+
+    async def delete_temp_voice(self, channel_id):
+        async with self.db.write() as db:
+            await db.execute("DELETE FROM tempvoiceusers WHERE channel_id = ?", (channel_id,))
+            await db.execute("DELETE FROM tempvoice_members WHERE channel_id = ?", (channel_id,))
+
+    async def is_listed(self, channel_id, kind, user_id):
+        """Проверить, есть ли пользователь в списке канала (поиск по первичному ключу)"""
+        row = await self.db.fetchone(
+            "SELECT 1 FROM tempvoice_members WHERE channel_id = ? AND kind = ? AND user_id = ?",
+            (channel_id, kind, user_id)
+        )
+        return row is not None
+
+    async def get_listed(self, channel_id, kind):
+        rows = await self.db.fetchall(
+            "SELECT user_id FROM tempvoice_members WHERE channel_id = ? AND kind = ?",
+            (channel_id, kind)
+        )
+        return {row[0] for row in rows}
+
+    async def add_listed(self, channel_id, kind, user_ids):
+        await self.db.executemany(
+            "INSERT OR IGNORE INTO tempvoice_members (channel_id, kind, user_id) VALUES (?, ?, ?)",
+            [(channel_id, kind, user_id) for user_id in user_ids]
+        )
+
+    async def remove_listed(self, channel_id, kind, user_ids):
+        await self.db.executemany(
+            "DELETE FROM tempvoice_members WHERE channel_id = ? AND kind = ? AND user_id = ?",
+            [(channel_id, kind, user_id) for user_id in user_ids]
+        )
 
     async def delete_empty_channels(self):
+        channels = await self.db.fetchall("SELECT channel_id FROM tempvoiceusers")
         for guild in self.bot.guilds:
-            async with aiosqlite.connect(self.path) as db:
-                channels = await db.execute("SELECT channel_id FROM tempvoiceusers").fetchall()
-                for channel_data in channels:
-                    channel_id = channel_data[0]
-                    channel = guild.get_channel(channel_id)
-                    if channel and hasattr(channel, 'members'):
-                        if len(channel.members) == 0:
-                            await channel.delete()
-                            await db.execute("DELETE FROM tempvoiceusers WHERE channel_id = ?", (channel_id,))
-                await db.commit()
+            for channel_data in channels:
+                channel_id = channel_data[0]
+                channel = guild.get_channel(channel_id)
+                if channel and hasattr(channel, 'members'):
+                    if len(channel.members) == 0:
+                        await channel.delete()
+                        await self.delete_temp_voice(channel_id)
 
     @commands.Cog.listener()
     async def on_voice_state_update(self, member, before, after):
         if before.channel is None and after.channel is not None:
-            async with aiosqlite.connect(self.path) as db:
-                setup = await db.execute("SELECT mother_channel_id FROM tempchannels WHERE guild_id = ?", (member.guild.id,)).fetchone()
-                if setup and after.channel.id == setup[0]:
-                    # Создаем временный канал
-                    category = member.guild.get_channel(setup[1]) if setup[1] else None
-                    tempvoice = await member.guild.create_voice_channel(
-                        f"🔊・{member.display_name}",
-                        category=category
-                    )
-                    await self.create_temp_voice(member.id, tempvoice.id, owner_id=member.id)
-                    await member.move_to(tempvoice)
-                    
-                    # Даем права создателю
-                    await tempvoice.set_permissions(member, connect=True, speak=True, view_channel=True)
+            setup = self.setups.get(member.guild.id)
+            if setup and after.channel.id == setup.mother_channel_id:
+                # Создаем временный канал
+                category = member.guild.get_channel(setup.category_id) if setup.category_id else None
+                tempvoice = await member.guild.create_voice_channel(
+                    f"🔊・{member.display_name}",
+                    category=category
+                )
+                await self.create_temp_voice(member.id, tempvoice.id, owner_id=member.id)
+                await member.move_to(tempvoice)
+                
+                # Даем права создателю
+                await tempvoice.set_permissions(member, connect=True, speak=True, view_channel=True)
+        
+        # Не пускаем забаненных во временные каналы (в базу идем только для каналов из категории)
+        if after.channel and after.channel != before.channel:
+            setup = self.setups.get(member.guild.id)
+            if (setup and after.channel.category_id == setup.category_id
+                    and after.channel.id != setup.mother_channel_id
+                    and await self.is_listed(after.channel.id, BANNED, member.id)):
+                await member.move_to(None)
         
         # Проверяем пустые каналы
         if before.channel and before.channel != after.channel:
             if len(before.channel.members) == 0:
-                async with aiosqlite.connect(self.path) as db:
-                    voice = await db.execute("SELECT * FROM tempvoiceusers WHERE channel_id = ?", (before.channel.id,)).fetchone()
-                    if voice:
-                        await before.channel.delete()
-                        await db.execute("DELETE FROM tempvoiceusers WHERE channel_id = ?", (before.channel.id,))
-                        await db.commit()
+                voice = await self.db.fetchone("SELECT creator_id FROM tempvoiceusers WHERE channel_id = ?", (before.channel.id,))
+                if voice:
+                    await before.channel.delete()
+                    await self.delete_temp_voice(before.channel.id)
 
     @commands.command(name="tv")
     @commands.has_permissions(administrator=True)
     async def setup(self, ctx):
-        async with aiosqlite.connect(self.path) as db:
-            setup = await db.execute("SELECT * FROM tempchannels WHERE guild_id = ?", (ctx.guild.id,)).fetchone()
-            if setup:
-                await ctx.send("✅ Сетап уже сделан.")
-                return
-            
-            message = await ctx.send("""**🛠️ Процесс создания начался.**\n░░░░░░░░░░░░ | 0%""")
-            
-            category = await ctx.guild.create_category("🎵 Временные голосовые каналы")
-            await message.edit(content="""**🛠️ Создание в процессе.**\n███░░░░░░░░░ | 25%""")
-            
-            channel = await ctx.guild.create_text_channel("🎵・настройки", category=category)
-            await message.edit(content="""**🛠️ Создание в процессе.**\n██████░░░░░░ | 50%""")
-            
-            mother_channel = await ctx.guild.create_voice_channel("➕・Создать канал", category=category)
-            await message.edit(content="""**🛠️ Создание в процессе.**\n█████████░░░ | 75%""")
-            
-            await db.execute("""INSERT INTO tempchannels (guild_id, category_id, settings_channel_id, mother_channel_id) 
-                             VALUES (?, ?, ?, ?)""", 
-                           (ctx.guild.id, category.id, channel.id, mother_channel.id))
-            await db.commit()
-            
-            emb = disnake.Embed(
-                title="🔊 Настройка временных голосовых каналов.", 
-                description="""🔇 - **заглушить пользователя**
+        if ctx.guild.id in self.setups:
+            await ctx.send("✅ Сетап уже сделан.")
+            return
+        
+        message = await ctx.send("""**🛠️ Процесс создания начался.**\n░░░░░░░░░░░░ | 0%""")
+        
+        category = await ctx.guild.create_category("🎵 Временные голосовые каналы")
+        await message.edit(content="""**🛠️ Создание в процессе.**\n███░░░░░░░░░ | 25%""")
+        
+        channel = await ctx.guild.create_text_channel("🎵・настройки", category=category)
+        await message.edit(content="""**🛠️ Создание в процессе.**\n██████░░░░░░ | 50%""")
+        
+        mother_channel = await ctx.guild.create_voice_channel("➕・Создать канал", category=category)
+        await message.edit(content="""**🛠️ Создание в процессе.**\n█████████░░░ | 75%""")
+        
+        await self.db.execute("""INSERT INTO tempchannels (guild_id, category_id, settings_channel_id, mother_channel_id) 
+                              VALUES (?, ?, ?, ?)""", 
+                            (ctx.guild.id, category.id, channel.id, mother_channel.id))
+        self.setups[ctx.guild.id] = TempChannelSetup(ctx.guild.id, category.id, channel.id, mother_channel.id)
+        
+        emb = disnake.Embed(
+            title="🔊 Настройка временных голосовых каналов.", 
+            description="""🔇 - **заглушить пользователя**
 ❌ - **забанить пользователя**
 👢 - **кикнуть пользователя**
 🔐 - **открыть / закрыть канал**
 👑 - **передать владение каналом**
 ⚙️ - **изменить битрейт канала**"""
-            )
-            
-            view = disnake.ui.View(timeout=None)
-            buttons = [
-                ("🔇", "mute", disnake.ButtonStyle.secondary),
-                ("❌", "ban", disnake.ButtonStyle.secondary),
-                ("👢", "kick", disnake.ButtonStyle.secondary),
-                ("🔐", "lock", disnake.ButtonStyle.secondary),
-                ("👑", "give_ownership", disnake.ButtonStyle.secondary),
-                ("⚙️", "bitrate", disnake.ButtonStyle.secondary),
-            ]
-            
-            for label, custom_id, style in buttons:
-                btn = disnake.ui.Button(label=label, style=style, custom_id=custom_id)
-                view.add_item(btn)
-            
-            await channel.send("@everyone", embed=emb, view=view)
-            await message.edit(content=f"""**✅ Сетап завершён!**\n████████████ | 100%\n
+        )
+        
+        view = disnake.ui.View(timeout=None)
+        buttons = [
+            ("🔇", "mute", disnake.ButtonStyle.secondary),
+            ("❌", "ban", disnake.ButtonStyle.secondary),
+            ("👢", "kick", disnake.ButtonStyle.secondary),
+            ("🔐", "lock", disnake.ButtonStyle.secondary),
+            ("👑", "give_ownership", disnake.ButtonStyle.secondary),
+            ("⚙️", "bitrate", disnake.ButtonStyle.secondary),
+        ]
+        
+        for label, custom_id, style in buttons:
+            btn = disnake.ui.Button(label=label, style=style, custom_id=custom_id)
+            view.add_item(btn)
+        
+        await channel.send("@everyone", embed=emb, view=view)
+        await message.edit(content=f"""**✅ Сетап завершён!**\n████████████ | 100%\n
 🔊 Каналы: {channel.mention}, {mother_channel.mention} | Категория: {category.name}""")
 
     @commands.Cog.listener()
@@ -166,12 +180,12 @@ class TempVoices(commands.Cog):
                 await inter.response.send_message("❌ Вы не создали временный канал.", ephemeral=True)
                 return
             
-            channel = inter.guild.get_channel(tempvoice[1])
+            channel = inter.guild.get_channel(tempvoice.channel_id)
             if not channel:
                 await inter.response.send_message("❌ Канал не найден.", ephemeral=True)
                 return
             
-            if tempvoice[4] == "true":  # is_private
+            if tempvoice.is_private == "true":
                 await channel.set_permissions(inter.guild.default_role, connect=False)
                 await self.edit_settings(inter.author.id, is_private="false")
                 await inter.response.send_message("✅ Вы закрыли канал.", ephemeral=True)
@@ -187,7 +201,7 @@ class TempVoices(commands.Cog):
                 await inter.response.send_message("❌ Вы не создали временный канал.", ephemeral=True)
                 return
             
-            channel = inter.guild.get_channel(tempvoice[1])
+            channel = inter.guild.get_channel(tempvoice.channel_id)
             if not channel or not hasattr(channel, 'members'):
                 await inter.response.send_message("❌ Голосовой канал не найден.", ephemeral=True)
                 return
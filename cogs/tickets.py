@@ -2,209 +2,311 @@
 import disnake
 from disnake.ext import commands
 from disnake.ui import Button, View, Modal, TextInput, Select
-import aiosqlite
 import asyncio
-from datetime import datetime
-import io
+import math
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from dataclasses import replace
 import textwrap
+from storage import Ticket, TicketConfig
+from storage import sla
+from storage.search import PAGE_SIZE, TicketSearch
+from storage.transcripts import TranscriptStore
+from utils.cooldowns import CooldownStore
+from utils.durations import format_duration
+from utils.export import FORMATS, TranscriptExport
+from utils.scheduler import DeadlineScheduler
+
+# Сколько тикетов закрывается одновременно (транскрипт, запись в базу, лог)
+CLOSE_WORKERS = 3
+# Пауза между сообщением о закрытии и удалением канала
+CLOSE_DELAY = 10
+# Как часто обновляется сообщение с прогрессом массового закрытия, в секундах
+PROGRESS_INTERVAL = 2
+# Этапы закрытия в /ticket_close_timings
+CLOSE_STAGES = {
+    "transcript": "Транскрипт",
+    "db": "База",
+    "log": "Лог",
+    "delete": "Удаление канала",
+    "total": "Всего",
+}
 
 class TicketSystem(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.path = "v1rago/dbs/file.db"
-        self.ticket_cooldowns = {}
+        self.db = bot.storage
+        self.transcripts = TranscriptStore(self.db)
+        self.search = TicketSearch(self.db)
+        # Кулдаун создания тикета: ключ "сервер:пользователь"
+        self.ticket_cooldowns = CooldownStore("ticket_create", self.db)
+        # Конфиг тикетов по серверам: грузится при первом обращении, обновляется при записи
+        self.configs = {}
+        # Канал -> ID открытого тикета, чтобы не ходить в базу на каждое сообщение
+        self.open_tickets = {}
+        # ID тикета -> (сервер, канал, время последней активности); сроки автозакрытия - в планировщике
+        self.activity = {}
+        self.auto_close = DeadlineScheduler(self.auto_close_ticket)
+        # Очередь закрытия: (ID тикета, канал, модератор, причина)
+        self.close_queue = asyncio.Queue()
+        self.closing = set()
+        self.close_workers = []
+        # Отсчеты перед удалением каналов; ссылки держим, чтобы задачи не собрал сборщик мусора
+        self.delete_tasks = set()
+        # Время этапов последних закрытий, в секундах; смотреть - /ticket_close_timings
+        self.close_timings = deque(maxlen=100)
 
-    async def init_db(self):
-        async with aiosqlite.connect(self.path) as db:
-            await db.execute("PRAGMA foreign_keys = ON")
-            
-            # Таблица тикетов
-            await db.execute("""CREATE TABLE IF NOT EXISTS tickets (
-                             id INTEGER PRIMARY KEY AUTOINCREMENT,
-                             author_id INTEGER,
-                             created_at TEXT,
-                             status TEXT DEFAULT 'open',
-                             channel_id INTEGER,
-                             moderator_id INTEGER DEFAULT NULL,
-                             guild_id INTEGER,
-                             ticket_type TEXT DEFAULT 'general',
-                             closed_at TEXT DEFAULT NULL,
-                             close_reason TEXT DEFAULT NULL)""")
-            
-            # Сообщения в тикетах
-            await db.execute("""CREATE TABLE IF NOT EXISTS ticket_messages (
-                             id INTEGER PRIMARY KEY AUTOINCREMENT,
-                             ticket_id INTEGER,
-                             author_id INTEGER,
-                             message TEXT,
-                             created_at TEXT,
-                             attachments TEXT DEFAULT NULL,
-                             FOREIGN KEY (ticket_id) REFERENCES tickets(id) ON DELETE CASCADE)""")
-            
-            # Транскрипты
-            await db.execute("""CREATE TABLE IF NOT EXISTS transcripts (
-                             id INTEGER PRIMARY KEY AUTOINCREMENT,
-                             ticket_id INTEGER,
-                             content TEXT,
-                             created_at TEXT,
-                             FOREIGN KEY (ticket_id) REFERENCES tickets(id) ON DELETE CASCADE)""")
-            
-            # Конфигурация
-            await db.execute("""CREATE TABLE IF NOT EXISTS ticket_config (
-                             guild_id INTEGER PRIMARY KEY,
-                             category_id INTEGER DEFAULT NULL,
-                             create_channel_id INTEGER DEFAULT NULL,
-                             create_message_id INTEGER DEFAULT NULL,
-                             log_channel_id INTEGER DEFAULT NULL,
-                             support_role_id INTEGER DEFAULT NULL,
-                             max_tickets_per_user INTEGER DEFAULT 3,
-                             ticket_cooldown INTEGER DEFAULT 300,
-                             require_topic BOOLEAN DEFAULT 0,
-                             auto_close_hours INTEGER DEFAULT 24,
-                             welcome_message TEXT DEFAULT 'Спасибо за обращение! Ожидайте ответа модератора.',
-                             ticket_types TEXT DEFAULT 'general,report,bug,support')""")
-            
-            # Темы тикетов
-            await db.execute("""CREATE TABLE IF NOT EXISTS ticket_topics (
-                             id INTEGER PRIMARY KEY AUTOINCREMENT,
-                             guild_id INTEGER,
-                             name TEXT,
-                             description TEXT,
-                             emoji TEXT DEFAULT '🎫')""")
+    async def cog_load(self):
+        await self.ticket_cooldowns.load()
+        
+        # Последняя активность открытого тикета - его последнее сообщение или время создания
+        tickets = await self.db.fetchall("""
+            SELECT t.id, t.channel_id, t.guild_id, t.created_at, MAX(m.created_at)
+            FROM tickets t LEFT JOIN ticket_messages m ON m.ticket_id = t.id
+            WHERE t.status = 'open' GROUP BY t.id
+        """)
+        for ticket_id, channel_id, guild_id, created_at, last_message in tickets:
+            self.open_tickets.setdefault(channel_id, ticket_id)
             
-            await db.commit()
+            last = datetime.strptime(created_at, "%Y-%m-%d %H:%M:%S").timestamp() if created_at else time.time()
+            if last_message:
+                # Время сообщений Discord - в UTC, время создания тикета - локальное
+                message_time = datetime.strptime(last_message, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+                last = max(last, message_time.timestamp())
+            await self.touch_ticket(ticket_id, guild_id, channel_id, last)
+        
+        self.auto_close.start()
+        self.close_workers = [asyncio.create_task(self.close_worker()) for _ in range(CLOSE_WORKERS)]
+
+    def cog_unload(self):
+        self.auto_close.stop()
+        for worker in self.close_workers:
+            worker.cancel()
+        for task in self.delete_tasks:
+            task.cancel()
 
     @commands.Cog.listener()
     async def on_ready(self):
-        await self.init_db()
         print(f"Ког {self.__class__.__name__} загружен!")
-        self.bot.loop.create_task(self.check_auto_close_tickets())
 
     async def get_ticket_config(self, guild_id):
-        async with aiosqlite.connect(self.path) as db:
-            config = await db.execute("SELECT * FROM ticket_config WHERE guild_id = ?", (guild_id,)).fetchone()
-            if config:
-                return {
-                    'guild_id': config[0],
-                    'category_id': config[1],
-                    'create_channel_id': config[2],
-                    'create_message_id': config[3],
-                    'log_channel_id': config[4],
-                    'support_role_id': config[5],
-                    'max_tickets_per_user': config[6],
-                    'ticket_cooldown': config[7],
-                    'require_topic': bool(config[8]),
-                    'auto_close_hours': config[9],
-                    'welcome_message': config[10],
-                    'ticket_types': config[11].split(',') if config[11] else ['general']
-                }
-            
+        config = self.configs.get(guild_id)
+        if config:
+            return config
+        
+        config = await self.db.get(TicketConfig, "WHERE guild_id = ?", (guild_id,))
+        if not config:
             # Конфиг по умолчанию
             default_types = 'general,report,bug,support,other'
-            await db.execute(
-                "INSERT INTO ticket_config (guild_id, ticket_types) VALUES (?, ?)",
+            await self.db.execute(
+                "INSERT OR IGNORE INTO ticket_config (guild_id, ticket_types) VALUES (?, ?)",
                 (guild_id, default_types)
             )
-            await db.commit()
-            
-            return {
-                'guild_id': guild_id,
-                'category_id': None,
-                'create_channel_id': None,
-                'create_message_id': None,
-                'log_channel_id': None,
-                'support_role_id': None,
-                'max_tickets_per_user': 3,
-                'ticket_cooldown': 300,
-                'require_topic': False,
-                'auto_close_hours': 24,
-                'welcome_message': 'Спасибо за обращение! Ожидайте ответа модератора.',
-                'ticket_types': default_types.split(',')
-            }
+            config = TicketConfig(guild_id, ticket_types=tuple(default_types.split(',')))
+        
+        return self.configs.setdefault(guild_id, config)
+
+    async def update_ticket_config(self, guild_id, **fields):
+        """Обновить конфиг в базе и в кэше"""
+        config = await self.get_ticket_config(guild_id)
+        set_clause = ", ".join(f"{key} = ?" for key in fields)
+        await self.db.execute(
+            f"UPDATE ticket_config SET {set_clause} WHERE guild_id = ?",
+            (*fields.values(), guild_id)
+        )
+        config = self.configs[guild_id] = replace(config, **fields)
+        
+        if "auto_close_hours" in fields:
+            for ticket_id, (ticket_guild, _, last) in self.activity.items():
+                if ticket_guild == guild_id:
+                    self.auto_close.cancel(ticket_id)
+                    if config.auto_close_hours > 0:
+                        self.auto_close.schedule(ticket_id, last + config.auto_close_hours * 3600)
+        return config
+
+    async def touch_ticket(self, ticket_id, guild_id, channel_id, when=None):
+        """Отметить активность в тикете и перенести срок его автозакрытия"""
+        when = when or time.time()
+        previous = self.activity.get(ticket_id)
+        if previous and previous[2] >= when:
+            return
+        
+        self.activity[ticket_id] = (guild_id, channel_id, when)
+        config = await self.get_ticket_config(guild_id)
+        if config.auto_close_hours > 0:
+            self.auto_close.schedule(ticket_id, when + config.auto_close_hours * 3600)
+
+    async def auto_close_ticket(self, ticket_id):
+        """Срок неактивности тикета истек - закрываем его"""
+        if ticket_id not in self.activity:
+            return
+        guild_id, channel_id, _ = self.activity[ticket_id]
+        
+        await self.bot.wait_until_ready()
+        channel = self.bot.get_channel(channel_id)
+        if not channel:
+            return
+        
+        config = await self.get_ticket_config(guild_id)
+        self.enqueue_close(
+            ticket_id, channel, self.bot.user.id,
+            f"Автоматическое закрытие (неактивность более {config.auto_close_hours} часов)"
+        )
 
     async def get_user_tickets_count(self, guild_id, user_id):
-        async with aiosqlite.connect(self.path) as db:
-            count = await db.execute(
-                "SELECT COUNT(*) FROM tickets WHERE guild_id = ? AND author_id = ? AND status = 'open'",
-                (guild_id, user_id)
-            ).fetchone()
-            return count[0] if count else 0
+        count = await self.db.fetchone(
+            "SELECT COUNT(*) FROM tickets WHERE guild_id = ? AND author_id = ? AND status = 'open'",
+            (guild_id, user_id)
+        )
+        return count[0] if count else 0
 
     async def create_ticket(self, guild_id, author_id, channel_id, ticket_type='general'):
-        async with aiosqlite.connect(self.path) as db:
-            created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            cursor = await db.execute(
-                "INSERT INTO tickets (guild_id, author_id, created_at, channel_id, ticket_type) VALUES (?, ?, ?, ?, ?)",
-                (guild_id, author_id, created_at, channel_id, ticket_type)
-            )
-            await db.commit()
-            return cursor.lastrowid
+        created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        ticket_id = await self.db.append(
+            "INSERT INTO tickets (guild_id, author_id, created_at, channel_id, ticket_type) VALUES (?, ?, ?, ?, ?)",
+            (guild_id, author_id, created_at, channel_id, ticket_type)
+        )
+        self.open_tickets[channel_id] = ticket_id
+        await self.touch_ticket(ticket_id, guild_id, channel_id)
+        return ticket_id
 
     async def close_ticket(self, ticket_id, moderator_id=None, reason="Не указана"):
-        async with aiosqlite.connect(self.path) as db:
-            closed_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        closed_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        async with self.db.write() as db:
+            async with db.execute(
+                "SELECT guild_id, ticket_type, created_at, status FROM tickets WHERE id = ?", (ticket_id,)
+            ) as cursor:
+                row = await cursor.fetchone()
+            if not row or row[3] == 'closed':
+                return False
+            
+            guild_id, ticket_type, created_at, _ = row
             await db.execute(
                 "UPDATE tickets SET status = 'closed', moderator_id = ?, closed_at = ?, close_reason = ? WHERE id = ?",
                 (moderator_id, closed_at, reason, ticket_id)
             )
-            await db.commit()
+            if created_at:
+                await sla.record(db, guild_id, "close", ticket_type, moderator_id, sla.elapsed(created_at, closed_at))
+        return True
 
     async def add_ticket_moderator(self, ticket_id, moderator_id):
-        async with aiosqlite.connect(self.path) as db:
-            await db.execute("UPDATE tickets SET moderator_id = ? WHERE id = ?", (moderator_id, ticket_id))
-            await db.commit()
+        """Назначить модератора и записать время принятия; False, если тикет уже принят"""
+        accepted_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        async with self.db.write() as db:
+            async with db.execute(
+                "SELECT guild_id, ticket_type, created_at, accepted_at FROM tickets WHERE id = ?", (ticket_id,)
+            ) as cursor:
+                row = await cursor.fetchone()
+            if not row or row[3]:
+                return False
+            
+            guild_id, ticket_type, created_at, _ = row
+            await db.execute(
+                "UPDATE tickets SET moderator_id = ?, accepted_at = ? WHERE id = ?",
+                (moderator_id, accepted_at, ticket_id)
+            )
+            if created_at:
+                await sla.record(db, guild_id, "accept", ticket_type, moderator_id, sla.elapsed(created_at, accepted_at))
+        return True
 
-    async def save_transcript(self, ticket_id, channel):
-        """Сохранить транскрипт тикета"""
-        messages = []
+    def format_message(self, message):
+        """Содержимое и вложения сообщения в том виде, в каком они идут в транскрипт"""
+        content = message.clean_content
+        if not content and message.embeds:
+            content = "[EMBED]"
+        elif not content and message.attachments:
+            content = "[ATTACHMENT]"
         
-        async for message in channel.history(limit=None, oldest_first=True):
-            if message.author.bot and not message.content and not message.embeds:
-                continue
-                
-            timestamp = message.created_at.strftime("%Y-%m-%d %H:%M:%S")
-            author = f"{message.author.name}#{message.author.discriminator}"
-            
-            content = message.clean_content
-            if not content and message.embeds:
-                content = "[EMBED]"
-            elif not content and message.attachments:
-                content = "[ATTACHMENT]"
-            
-            attachments = ""
-            if message.attachments:
-                attachments = " | Вложения: " + ", ".join([att.filename for att in message.attachments])
-            
-            messages.append(f"[{timestamp}] {author}: {content}{attachments}")
+        attachments = ", ".join([att.filename for att in message.attachments]) or None
+        return content, attachments
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        ticket_id = self.open_tickets.get(message.channel.id)
+        if ticket_id is None:
+            return
+        if message.author.bot and not message.content and not message.embeds:
+            return
         
-        transcript_content = "\n".join(messages)
+        content, attachments = self.format_message(message)
+        # Сообщения копятся в очереди группового коммита, а не пишутся по одному
+        self.db.append_nowait(
+            """INSERT INTO ticket_messages (ticket_id, message_id, author_id, author_name, message, created_at, attachments) 
+            VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (ticket_id, message.id, message.author.id, f"{message.author.name}#{message.author.discriminator}",
+             content, message.created_at.strftime("%Y-%m-%d %H:%M:%S"), attachments)
+        )
+        await self.touch_ticket(ticket_id, message.guild.id, message.channel.id, message.created_at.timestamp())
+
+    @commands.Cog.listener()
+    async def on_message_edit(self, before, after):
+        ticket_id = self.open_tickets.get(after.channel.id)
+        if ticket_id is None or before.content == after.content:
+            return
         
-        async with aiosqlite.connect(self.path) as db:
-            await db.execute(
-                "INSERT INTO transcripts (ticket_id, content, created_at) VALUES (?, ?, ?)",
-                (ticket_id, transcript_content, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        content, attachments = self.format_message(after)
+        self.db.append_nowait(
+            "UPDATE ticket_messages SET message = ?, attachments = ? WHERE ticket_id = ? AND message_id = ?",
+            (content, attachments, ticket_id, after.id)
+        )
+
+    async def export_messages(self, ticket_id, channel=None, fmt="txt"):
+        """Записать сообщения тикета потоком во временный файл выбранного формата"""
+        # Последние сообщения могут еще стоять в очереди записи
+        await self.db.flush()
+        export = TranscriptExport(ticket_id, fmt)
+        
+        if channel:
+            # Тикет мог быть открыт до появления записи сообщений: все, что раньше первого
+            # записанного сообщения, берем из истории канала. У новых тикетов там пусто
+            (first_id,) = await self.db.fetchone(
+                "SELECT MIN(message_id) FROM ticket_messages WHERE ticket_id = ?", (ticket_id,)
             )
-            await db.commit()
+            before = disnake.Object(first_id) if first_id else None
+            async for message in channel.history(limit=None, before=before, oldest_first=True):
+                if message.author.bot and not message.content and not message.embeds:
+                    continue
+                
+                timestamp = message.created_at.strftime("%Y-%m-%d %H:%M:%S")
+                author = f"{message.author.name}#{message.author.discriminator}"
+                export.add(timestamp, author, *self.format_message(message))
         
-        return transcript_content
+        async for row in self.transcripts.messages(ticket_id):
+            export.add(*row)
+        
+        return export
 
-    async def get_ticket_info(self, ticket_id):
-        async with aiosqlite.connect(self.path) as db:
-            ticket = await db.execute("SELECT * FROM tickets WHERE id = ?", (ticket_id,)).fetchone()
-            if ticket:
-                return {
-                    'id': ticket[0],
-                    'author_id': ticket[1],
-                    'created_at': ticket[2],
-                    'status': ticket[3],
-                    'channel_id': ticket[4],
-                    'moderator_id': ticket[5],
-                    'guild_id': ticket[6],
-                    'ticket_type': ticket[7],
-                    'closed_at': ticket[8],
-                    'close_reason': ticket[9]
-                }
+    async def save_transcript(self, ticket_id, channel):
+        """Сохранить транскрипт тикета и вернуть его текстовый экспорт"""
+        export = await self.export_messages(ticket_id, channel)
+        export.finish()
+        if export.rows:
+            await self.transcripts.save(ticket_id, export.file)
+        return export
+
+    async def get_transcript_file(self, ticket_id, fmt="txt", limit=None):
+        """Транскрипт тикета в виде файла для отправки"""
+        if fmt != "txt":
+            export = await self.export_messages(ticket_id, fmt=fmt)
+            if export.rows:
+                return export.to_file(limit)
+        
+        # Сохраненный текст; у старых тикетов без записанных сообщений есть только он
+        content_hash = await self.transcripts.latest_hash(ticket_id)
+        if not content_hash:
             return None
+        
+        export = TranscriptExport(ticket_id)
+        async for part in self.transcripts.stream(content_hash):
+            export.add_text(part)
+        return export.to_file(limit)
+
+    async def get_ticket_info(self, ticket_id):
+        return await self.db.get(Ticket, "WHERE id = ?", (ticket_id,))
+
+    async def get_ticket_by_channel(self, channel_id):
+        return await self.db.get(Ticket, "WHERE channel_id = ?", (channel_id,))
 
     @commands.slash_command(name="ticket_setup", description="Настроить систему тикетов")
     @commands.has_permissions(administrator=True)
@@ -216,16 +318,15 @@ class TicketSystem(commands.Cog):
                           max_tickets: int = commands.Param(description="Макс. тикетов на пользователя", default=3, ge=1, le=10),
                           cooldown: int = commands.Param(description="КД создания тикетов (сек)", default=300, ge=0, le=3600)):
         
-        config = await self.get_ticket_config(inter.guild.id)
-        
-        async with aiosqlite.connect(self.path) as db:
-            await db.execute("""UPDATE ticket_config SET 
-                             category_id = ?, create_channel_id = ?, support_role_id = ?, 
-                             log_channel_id = ?, max_tickets_per_user = ?, ticket_cooldown = ? 
-                             WHERE guild_id = ?""",
-                           (category.id, create_channel.id, support_role.id if support_role else None,
-                            log_channel.id if log_channel else None, max_tickets, cooldown, inter.guild.id))
-            await db.commit()
+        config = await self.update_ticket_config(
+            inter.guild.id,
+            category_id=category.id,
+            create_channel_id=create_channel.id,
+            support_role_id=support_role.id if support_role else None,
+            log_channel_id=log_channel.id if log_channel else None,
+            max_tickets_per_user=max_tickets,
+            ticket_cooldown=cooldown
+        )
         
         # Создаем сообщение с кнопками
         embed = disnake.Embed(
@@ -234,8 +335,6 @@ class TicketSystem(commands.Cog):
             color=disnake.Color.green()
         )
         
-        config = await self.get_ticket_config(inter.guild.id)
-        
         # Создаем view с кнопками для типов тикетов
         view = TicketCreateView(self.bot, config)
         
@@ -244,11 +343,7 @@ class TicketSystem(commands.Cog):
         message = await create_channel.send(embed=embed, view=view)
         
         # Сохраняем ID сообщения
-        await db.execute(
-            "UPDATE ticket_config SET create_message_id = ? WHERE guild_id = ?",
-            (message.id, inter.guild.id)
-        )
-        await db.commit()
+        await self.update_ticket_config(inter.guild.id, create_message_id=message.id)
         
         embed = disnake.Embed(
             title="✅ Настройка тикетов завершена",
@@ -270,262 +365,454 @@ class TicketSystem(commands.Cog):
         
         if user:
             # Закрыть тикет пользователя
-            async with aiosqlite.connect(self.path) as db:
-                ticket = await db.execute(
-                    "SELECT * FROM tickets WHERE author_id = ? AND guild_id = ? AND status = 'open'",
-                    (user.id, inter.guild.id)
-                ).fetchone()
-                
-                if not ticket:
-                    await inter.response.send_message(f"❌ У {user.mention} нет открытых тикетов.", ephemeral=True)
-                    return
-                
-                channel = inter.guild.get_channel(ticket[4])
-                if channel:
-                    await self.process_ticket_close(ticket[0], channel, inter.author.id, reason)
-                    await inter.response.send_message(f"✅ Тикет пользователя {user.mention} закрыт.", ephemeral=True)
-                else:
-                    await inter.response.send_message("❌ Канал тикета не найден.", ephemeral=True)
+            ticket = await self.db.get(
+                Ticket, "WHERE author_id = ? AND guild_id = ? AND status = 'open'",
+                (user.id, inter.guild.id)
+            )
+            
+            if not ticket:
+                await inter.response.send_message(f"❌ У {user.mention} нет открытых тикетов.", ephemeral=True)
+                return
+            
+            channel = inter.guild.get_channel(ticket.channel_id)
+            if channel:
+                self.enqueue_close(ticket.id, channel, inter.author.id, reason)
+                await inter.response.send_message(f"✅ Тикет пользователя {user.mention} закрывается.", ephemeral=True)
+            else:
+                await inter.response.send_message("❌ Канал тикета не найден.", ephemeral=True)
         else:
             # Закрыть текущий тикет
-            async with aiosqlite.connect(self.path) as db:
-                ticket = await db.execute(
-                    "SELECT * FROM tickets WHERE channel_id = ?", (inter.channel.id,)
-                ).fetchone()
-                
-                if not ticket:
-                    await inter.response.send_message("❌ Этот канал не является тикетом.", ephemeral=True)
-                    return
-                
-                await self.process_ticket_close(ticket[0], inter.channel, inter.author.id, reason)
-                await inter.response.send_message("✅ Тикет закрыт.", ephemeral=True)
+            ticket = await self.get_ticket_by_channel(inter.channel.id)
+            
+            if not ticket:
+                await inter.response.send_message("❌ Этот канал не является тикетом.", ephemeral=True)
+                return
+            
+            self.enqueue_close(ticket.id, inter.channel, inter.author.id, reason)
+            await inter.response.send_message("✅ Тикет закрывается.", ephemeral=True)
+
+    @commands.slash_command(name="ticket_bulk_close", description="Массовое закрытие тикетов по фильтрам")
+    @commands.has_permissions(administrator=True)
+    async def ticket_bulk_close(self, inter: disnake.ApplicationCommandInteraction,
+                               idle_hours: int = commands.Param(description="Без активности дольше N часов", default=None, ge=0),
+                               ticket_type: str = commands.Param(name="type", description="Тип тикета", default=None),
+                               author: disnake.User = commands.Param(description="Автор тикета", default=None),
+                               unaccepted: bool = commands.Param(description="Только непринятые", default=False),
+                               reason: str = commands.Param(description="Причина закрытия", default="Массовое закрытие"),
+                               concurrency: int = commands.Param(description="Сколько тикетов закрывать одновременно", default=3, ge=1, le=10)):
+        
+        if idle_hours is None and not ticket_type and not author and not unaccepted:
+            await inter.response.send_message("❌ Укажите хотя бы один фильтр.", ephemeral=True)
+            return
+        
+        await inter.response.defer(ephemeral=True)
+        
+        where = ["guild_id = ?", "status = 'open'"]
+        params = [inter.guild.id]
+        if ticket_type:
+            where.append("ticket_type = ?")
+            params.append(ticket_type)
+        if author:
+            where.append("author_id = ?")
+            params.append(author.id)
+        if unaccepted:
+            where.append("moderator_id IS NULL")
+        rows = await self.db.fetchall(f"SELECT id, channel_id FROM tickets WHERE {' AND '.join(where)}", params)
+        
+        # Неактивность - по тому же времени последней активности, что и у автозакрытия
+        idle_before = time.time() - idle_hours * 3600 if idle_hours is not None else None
+        tickets = []
+        for ticket_id, channel_id in rows:
+            if ticket_id in self.closing:
+                continue
+            if idle_before is not None and ticket_id in self.activity and self.activity[ticket_id][2] > idle_before:
+                continue
+            tickets.append((ticket_id, channel_id))
+        
+        if not tickets:
+            await inter.edit_original_response("❌ Подходящих тикетов нет.")
+            return
+        
+        self.closing.update(ticket_id for ticket_id, _ in tickets)
+        done = failed = 0
+        # Число одновременных закрытий ограничено: запросы к Discord упираются в лимиты
+        # на сервер и на канал, лишние параллельные запросы только ждут в очереди лимитов
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def close_one(ticket_id, channel_id):
+            nonlocal done, failed
+            async with semaphore:
+                try:
+                    channel = inter.guild.get_channel(channel_id)
+                    if channel:
+                        await self.process_ticket_close(ticket_id, channel, inter.author.id, reason, countdown=False)
+                    else:
+                        # Канал уже удален вручную - закрываем только запись
+                        await self.close_ticket(ticket_id, inter.author.id, reason)
+                        self.open_tickets.pop(channel_id, None)
+                        self.activity.pop(ticket_id, None)
+                        self.auto_close.cancel(ticket_id)
+                        self.closing.discard(ticket_id)
+                    done += 1
+                except Exception as e:
+                    failed += 1
+                    self.closing.discard(ticket_id)
+                    print(f"Ошибка при массовом закрытии тикета #{ticket_id}: {e}")
+        
+        def progress_text(icon="🔄"):
+            text = f"{icon} Закрыто {done} из {len(tickets)}"
+            return text + (f", ошибок: {failed}" if failed else "")
+        
+        async def report_progress():
+            while True:
+                await inter.edit_original_response(progress_text())
+                await asyncio.sleep(PROGRESS_INTERVAL)
+        
+        progress = asyncio.create_task(report_progress())
+        try:
+            await asyncio.gather(*(close_one(ticket_id, channel_id) for ticket_id, channel_id in tickets))
+        finally:
+            progress.cancel()
+        
+        await inter.edit_original_response(progress_text("✅"))
 
     @commands.slash_command(name="ticket_add", description="Добавить пользователя в тикет")
     @commands.has_permissions(manage_channels=True)
     async def ticket_add(self, inter: disnake.ApplicationCommandInteraction,
                         user: disnake.Member = commands.Param(description="Пользователь для добавления")):
         
-        async with aiosqlite.connect(self.path) as db:
-            ticket = await db.execute(
-                "SELECT * FROM tickets WHERE channel_id = ?", (inter.channel.id,)
-            ).fetchone()
-            
-            if not ticket:
-                await inter.response.send_message("❌ Этот канал не является тикетом.", ephemeral=True)
-                return
-            
-            await inter.channel.set_permissions(user, read_messages=True, send_messages=True)
-            
-            embed = disnake.Embed(
-                title="👥 Пользователь добавлен",
-                description=f"{user.mention} был добавлен в тикет.",
-                color=disnake.Color.green()
-            )
-            await inter.response.send_message(embed=embed)
-            
-            # Уведомляем пользователя
-            try:
-                await user.send(f"📨 Вас добавили в тикет на сервере **{inter.guild.name}**: {inter.channel.mention}")
-            except:
-                pass
+        ticket = await self.get_ticket_by_channel(inter.channel.id)
+        
+        if not ticket:
+            await inter.response.send_message("❌ Этот канал не является тикетом.", ephemeral=True)
+            return
+        
+        await inter.channel.set_permissions(user, read_messages=True, send_messages=True)
+        
+        embed = disnake.Embed(
+            title="👥 Пользователь добавлен",
+            description=f"{user.mention} был добавлен в тикет.",
+            color=disnake.Color.green()
+        )
+        await inter.response.send_message(embed=embed)
+        
+        # Уведомляем пользователя
+        try:
+            await user.send(f"📨 Вас добавили в тикет на сервере **{inter.guild.name}**: {inter.channel.mention}")
+        except:
+            pass
 
     @commands.slash_command(name="ticket_remove", description="Удалить пользователя из тикета")
     @commands.has_permissions(manage_channels=True)
     async def ticket_remove(self, inter: disnake.ApplicationCommandInteraction,
                            user: disnake.Member = commands.Param(description="Пользователь для удаления")):
         
-        async with aiosqlite.connect(self.path) as db:
-            ticket = await db.execute(
-                "SELECT * FROM tickets WHERE channel_id = ?", (inter.channel.id,)
-            ).fetchone()
+        ticket = await self.get_ticket_by_channel(inter.channel.id)
+        
+        if not ticket:
+            await inter.response.send_message("❌ Этот канал не является тикетом.", ephemeral=True)
+            return
+        
+        if user.id == ticket.author_id:  # Автора тикета нельзя удалить
+            await inter.response.send_message("❌ Нельзя удалить автора тикета.", ephemeral=True)
+            return
+        
+        await inter.channel.set_permissions(user, overwrite=None)
+        
+        embed = disnake.Embed(
+            title="👥 Пользователь удален",
+            description=f"{user.mention} был удален из тикета.",
+            color=disnake.Color.red()
+        )
+        await inter.response.send_message(embed=embed)
+
+    @commands.slash_command(name="ticket_transcript", description="Получить транскрипт тикета")
+    @commands.has_permissions(manage_channels=True)
+    async def ticket_transcript(self, inter: disnake.ApplicationCommandInteraction,
+                               ticket_id: int = commands.Param(description="ID тикета (оставьте пустым для текущего)", default=None),
+                               fmt: str = commands.Param(name="format", description="Формат файла", default="txt", choices=list(FORMATS))):
+        
+        if ticket_id:
+            # Получить транскрипт по ID
+            file = await self.get_transcript_file(ticket_id, fmt, inter.guild.filesize_limit)
+            
+            if file:
+                await inter.response.send_message("Вот транскрипт тикета:", file=file, ephemeral=True)
+            else:
+                await inter.response.send_message("❌ Транскрипт не найден.", ephemeral=True)
+        else:
+            # Получить транскрипт текущего тикета
+            ticket = await self.get_ticket_by_channel(inter.channel.id)
             
             if not ticket:
                 await inter.response.send_message("❌ Этот канал не является тикетом.", ephemeral=True)
                 return
             
-            if user.id == ticket[1]:  # Автора тикета нельзя удалить
-                await inter.response.send_message("❌ Нельзя удалить автора тикета.", ephemeral=True)
-                return
-            
-            await inter.channel.set_permissions(user, overwrite=None)
+            export = await self.save_transcript(ticket.id, inter.channel)
+            if fmt != "txt":
+                export = await self.export_messages(ticket.id, inter.channel, fmt)
             
-            embed = disnake.Embed(
-                title="👥 Пользователь удален",
-                description=f"{user.mention} был удален из тикета.",
-                color=disnake.Color.red()
+            file = export.to_file(inter.guild.filesize_limit)
+            await inter.response.send_message("Вот транскрипт тикета:", file=file, ephemeral=True)
+
+    @commands.slash_command(name="ticket_search", description="Поиск по транскриптам тикетов")
+    @commands.has_permissions(manage_channels=True)
+    async def ticket_search(self, inter: disnake.ApplicationCommandInteraction,
+                           query: str = commands.Param(description="Слова для поиска (слово* - поиск по началу)"),
+                           ticket_type: str = commands.Param(name="type", description="Тип тикета", default=None),
+                           author: disnake.User = commands.Param(description="Автор тикета", default=None),
+                           since: str = commands.Param(description="Создан с даты (ГГГГ-ММ-ДД)", default=None),
+                           until: str = commands.Param(description="Создан по дату включительно (ГГГГ-ММ-ДД)", default=None),
+                           page: int = commands.Param(description="Страница", default=1, ge=1)):
+        
+        try:
+            since_str = datetime.strptime(since, "%Y-%m-%d").strftime("%Y-%m-%d %H:%M:%S") if since else None
+            until_str = (datetime.strptime(until, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S") if until else None
+        except ValueError:
+            await inter.response.send_message("❌ Дата должна быть в формате ГГГГ-ММ-ДД.", ephemeral=True)
+            return
+        
+        total, rows = await self.search.search(
+            inter.guild.id, query, ticket_type, author.id if author else None, since_str, until_str, page
+        )
+        
+        if not rows:
+            text = "❌ Ничего не найдено." if not total else "❌ На этой странице ничего нет."
+            await inter.response.send_message(text, ephemeral=True)
+            return
+        
+        pages = (total + PAGE_SIZE - 1) // PAGE_SIZE
+        embed = disnake.Embed(
+            title=f"🔎 Поиск: {query[:200]}",
+            description=f"Найдено тикетов: {total}",
+            color=disnake.Color.blue()
+        )
+        for ticket_id, author_id, ticket_type, status, created_at, closed_at, snippet in rows:
+            embed.add_field(
+                name=f"#{ticket_id} • {ticket_type} • {status}",
+                value=f"<@{author_id}> • {created_at}\n{snippet[:900]}",
+                inline=False
             )
-            await inter.response.send_message(embed=embed)
+        embed.set_footer(text=f"Страница {page} из {pages}")
+        
+        await inter.response.send_message(embed=embed, ephemeral=True)
 
-    @commands.slash_command(name="ticket_transcript", description="Получить транскрипт тикета")
+    @commands.slash_command(name="ticket_sla", description="Время принятия и закрытия тикетов (p50/p90/p99)")
     @commands.has_permissions(manage_channels=True)
-    async def ticket_transcript(self, inter: disnake.ApplicationCommandInteraction,
-                               ticket_id: int = commands.Param(description="ID тикета (оставьте пустым для текущего)", default=None)):
+    async def ticket_sla(self, inter: disnake.ApplicationCommandInteraction,
+                        by: str = commands.Param(description="Группировка", default="guild",
+                                                 choices={"Сервер": "guild", "Тип тикета": "type", "Модератор": "moderator"})):
+        report = await sla.report(self.db, inter.guild.id, by)
         
-        if ticket_id:
-            # Получить транскрипт по ID
-            async with aiosqlite.connect(self.path) as db:
-                transcript = await db.execute(
-                    "SELECT content FROM transcripts WHERE ticket_id = ? ORDER BY id DESC LIMIT 1",
-                    (ticket_id,)
-                ).fetchone()
-                
-                if transcript:
-                    file = disnake.File(
-                        io.StringIO(transcript[0]),
-                        filename=f"ticket_{ticket_id}.txt"
-                    )
-                    await inter.response.send_message("Вот транскрипт тикета:", file=file, ephemeral=True)
-                else:
-                    await inter.response.send_message("❌ Транскрипт не найден.", ephemeral=True)
-        else:
-            # Получить транскрипт текущего тикета
-            async with aiosqlite.connect(self.path) as db:
-                ticket = await db.execute(
-                    "SELECT id FROM tickets WHERE channel_id = ?", (inter.channel.id,)
-                ).fetchone()
-                
-                if not ticket:
-                    await inter.response.send_message("❌ Этот канал не является тикетом.", ephemeral=True)
-                    return
-                
-                transcript_content = await self.save_transcript(ticket[0], inter.channel)
-                
-                file = disnake.File(
-                    io.StringIO(transcript_content),
-                    filename=f"ticket_{ticket[0]}.txt"
-                )
-                await inter.response.send_message("Вот транскрипт тикета:", file=file, ephemeral=True)
+        if not report:
+            await inter.response.send_message("❌ Пока нет данных.", ephemeral=True)
+            return
+        
+        embed = disnake.Embed(
+            title="⏱️ Время реакции по тикетам",
+            description="Перцентили p50 / p90 / p99, точность ±10%",
+            color=disnake.Color.blue()
+        )
+        
+        # Самые нагруженные группы - первыми
+        ordered = sorted(report.items(), key=lambda item: -sum(total for total, _ in item[1].values()))
+        for key, metrics in ordered[:10]:
+            if by == "guild":
+                name = inter.guild.name
+            elif by == "moderator":
+                member = inter.guild.get_member(key) if key else None
+                name = member.display_name if member else f"ID: {key or '—'}"
+            else:
+                name = key
+            
+            lines = []
+            for metric, label in (("accept", "Принятие"), ("close", "Закрытие")):
+                if metric in metrics:
+                    total, values = metrics[metric]
+                    lines.append(f"{label}: " + " / ".join(format_duration(value) for value in values) + f" (n={total})")
+            embed.add_field(name=name, value="\n".join(lines), inline=False)
+        
+        await inter.response.send_message(embed=embed, ephemeral=True)
+
+    @commands.slash_command(name="ticket_close_timings", description="Время этапов последних закрытий тикетов")
+    @commands.has_permissions(administrator=True)
+    async def ticket_close_timings(self, inter: disnake.ApplicationCommandInteraction):
+        timings = [closed for closed in self.close_timings if closed["guild_id"] == inter.guild.id]
+        
+        if not timings:
+            await inter.response.send_message("❌ Пока нет данных.", ephemeral=True)
+            return
+        
+        embed = disnake.Embed(
+            title="⏱️ Этапы закрытия тикетов",
+            description=f"Среднее / максимум по последним закрытиям: {len(timings)}",
+            color=disnake.Color.blue()
+        )
+        for stage, label in CLOSE_STAGES.items():
+            values = [closed[stage] for closed in timings]
+            embed.add_field(name=label, value=f"{sum(values) / len(values):.2f}с / {max(values):.2f}с", inline=True)
+        
+        await inter.response.send_message(embed=embed, ephemeral=True)
 
     @commands.slash_command(name="ticket_stats", description="Статистика тикетов")
     @commands.has_permissions(manage_channels=True)
     async def ticket_stats(self, inter: disnake.ApplicationCommandInteraction):
-        async with aiosqlite.connect(self.path) as db:
-            # Общая статистика
-            total = await db.execute(
-                "SELECT COUNT(*) FROM tickets WHERE guild_id = ?", (inter.guild.id,)
-            ).fetchone()
-            
-            open_tickets = await db.execute(
-                "SELECT COUNT(*) FROM tickets WHERE guild_id = ? AND status = 'open'", (inter.guild.id,)
-            ).fetchone()
-            
-            closed_tickets = await db.execute(
-                "SELECT COUNT(*) FROM tickets WHERE guild_id = ? AND status = 'closed'", (inter.guild.id,)
-            ).fetchone()
-            
-            # Топ пользователей по тикетам
-            top_users = await db.execute("""
-                SELECT author_id, COUNT(*) as ticket_count 
-                FROM tickets WHERE guild_id = ? 
-                GROUP BY author_id 
-                ORDER BY ticket_count DESC 
+        # Все счетчики одним запросом: итог, типы, последние 7 дней и топ-5 авторов
+        since = (datetime.now() - timedelta(days=6)).strftime("%Y-%m-%d")
+        rows = await self.db.fetchall("""
+            SELECT kind, key, opened, closed FROM ticket_stats
+            WHERE guild_id = ? AND (kind IN ('total', 'type') OR (kind = 'day' AND key >= ?))
+            UNION ALL
+            SELECT * FROM (
+                SELECT kind, key, opened, closed FROM ticket_stats
+                WHERE guild_id = ? AND kind = 'author'
+                ORDER BY opened DESC
                 LIMIT 5
-            """, (inter.guild.id,)).fetchall()
-            
-            embed = disnake.Embed(
-                title="📊 Статистика тикетов",
-                color=disnake.Color.blue()
             )
-            
-            embed.add_field(name="Всего тикетов", value=str(total[0]), inline=True)
-            embed.add_field(name="Открытых", value=str(open_tickets[0]), inline=True)
-            embed.add_field(name="Закрытых", value=str(closed_tickets[0]), inline=True)
-            
-            if top_users:
-                users_text = ""
-                for user_id, count in top_users:
-                    user = inter.guild.get_member(user_id)
-                    name = user.mention if user else f"ID: {user_id}"
-                    users_text += f"{name}: {count} тикетов\n"
-                embed.add_field(name="Топ пользователей", value=users_text, inline=False)
-            
-            await inter.response.send_message(embed=embed)
+        """, (inter.guild.id, since, inter.guild.id))
+        
+        total = (0, 0)
+        types, days, top_users = [], [], []
+        for kind, key, opened, closed in rows:
+            if kind == "total":
+                total = (opened, closed)
+            elif kind == "type":
+                types.append((key, opened, closed))
+            elif kind == "day":
+                days.append((key, opened, closed))
+            else:
+                top_users.append((int(key), opened))
+        
+        embed = disnake.Embed(
+            title="📊 Статистика тикетов",
+            color=disnake.Color.blue()
+        )
+        
+        embed.add_field(name="Всего тикетов", value=str(total[0]), inline=True)
+        embed.add_field(name="Открытых", value=str(total[0] - total[1]), inline=True)
+        embed.add_field(name="Закрытых", value=str(total[1]), inline=True)
+        
+        if types:
+            types_text = ""
+            for ticket_type, opened, closed in sorted(types, key=lambda item: -item[1]):
+                types_text += f"{ticket_type}: {opened} (открыто {opened - closed})\n"
+            embed.add_field(name="По типам", value=types_text, inline=True)
+        
+        if days:
+            days_text = ""
+            for day, opened, closed in sorted(days, reverse=True):
+                days_text += f"{day}: +{opened} / −{closed}\n"
+            embed.add_field(name="За 7 дней (создано / закрыто)", value=days_text, inline=True)
+        
+        if top_users:
+            users_text = ""
+            for user_id, count in top_users:
+                user = inter.guild.get_member(user_id)
+                name = user.mention if user else f"ID: {user_id}"
+                users_text += f"{name}: {count} тикетов\n"
+            embed.add_field(name="Топ пользователей", value=users_text, inline=False)
+        
+        await inter.response.send_message(embed=embed)
+
+    def enqueue_close(self, ticket_id, channel, moderator_id, reason):
+        """Поставить тикет в очередь на закрытие; False, если он уже закрывается"""
+        if ticket_id in self.closing:
+            return False
+        self.closing.add(ticket_id)
+        self.close_queue.put_nowait((ticket_id, channel, moderator_id, reason))
+        return True
+
+    async def close_worker(self):
+        while True:
+            ticket_id, channel, moderator_id, reason = await self.close_queue.get()
+            try:
+                await self.process_ticket_close(ticket_id, channel, moderator_id, reason)
+            except Exception as e:
+                self.closing.discard(ticket_id)
+                print(f"Ошибка при закрытии тикета #{ticket_id}: {e}")
+            finally:
+                self.close_queue.task_done()
 
-    async def process_ticket_close(self, ticket_id, channel, moderator_id, reason):
-        """Обработка закрытия тикета"""
+    async def process_ticket_close(self, ticket_id, channel, moderator_id, reason, countdown=True):
+        """Обработка закрытия тикета; без countdown канал удаляется сразу, в этом же вызове"""
+        timings = {"ticket_id": ticket_id, "guild_id": channel.guild.id}
+        started = last = time.perf_counter()
+        
+        def mark(stage):
+            nonlocal last
+            now = time.perf_counter()
+            timings[stage] = now - last
+            last = now
         
         # Сохраняем транскрипт
-        transcript_content = await self.save_transcript(ticket_id, channel)
+        export = await self.save_transcript(ticket_id, channel)
+        self.open_tickets.pop(channel.id, None)
+        self.activity.pop(ticket_id, None)
+        self.auto_close.cancel(ticket_id)
+        if export.rows:
+            await self.search.index(ticket_id, export.file)
+        mark("transcript")
         
         # Обновляем статус в БД
         await self.close_ticket(ticket_id, moderator_id, reason)
+        ticket_info = await self.get_ticket_info(ticket_id)
+        mark("db")
         
         # Логируем закрытие
-        ticket_info = await self.get_ticket_info(ticket_id)
         config = await self.get_ticket_config(channel.guild.id)
         
-        if config['log_channel_id']:
-            log_channel = channel.guild.get_channel(config['log_channel_id'])
+        if config.log_channel_id:
+            log_channel = channel.guild.get_channel(config.log_channel_id)
             if log_channel:
                 embed = disnake.Embed(
                     title="🎫 Тикет закрыт",
                     description=f"**Тикет:** #{ticket_id}\n"
-                              f"**Автор:** <@{ticket_info['author_id']}>\n"
+                              f"**Автор:** <@{ticket_info.author_id}>\n"
                               f"**Модератор:** <@{moderator_id}>\n"
                               f"**Причина:** {reason}\n"
-                              f"**Тип:** {ticket_info['ticket_type']}\n"
-                              f"**Создан:** {ticket_info['created_at']}\n"
-                              f"**Закрыт:** {ticket_info['closed_at']}",
+                              f"**Тип:** {ticket_info.ticket_type}\n"
+                              f"**Создан:** {ticket_info.created_at}\n"
+                              f"**Закрыт:** {ticket_info.closed_at}",
                     color=disnake.Color.red()
                 )
-                await log_channel.send(embed=embed)
-                
-                # Отправляем транскрипт как файл
-                if transcript_content:
-                    file = disnake.File(
-                        io.StringIO(transcript_content),
-                        filename=f"ticket_{ticket_id}.txt"
-                    )
-                    await log_channel.send(file=file)
-        
-        # Отсчет перед удалением
-        embed = disnake.Embed(
-            title="🔒 Тикет закрыт",
-            description=f"**Причина:** {reason}\n\nКанал будет удален через 10 секунд.",
-            color=disnake.Color.red()
-        )
-        await channel.send(embed=embed)
+                # Транскрипт уходит файлом в том же сообщении
+                file = export.to_file(channel.guild.filesize_limit) if export.rows else None
+                await log_channel.send(embed=embed, file=file)
+        mark("log")
         
-        for i in range(9, -1, -1):
-            await asyncio.sleep(1)
-            if i <= 5:
-                embed.description = f"**Причина:** {reason}\n\nКанал будет удален через {i} секунд."
-                await channel.send(embed=embed)
-        
-        await channel.delete()
+        if countdown:
+            # Отсчет и удаление не занимают обработчик очереди
+            task = asyncio.create_task(self.delete_ticket_channel(ticket_id, channel, reason, timings, started))
+            self.delete_tasks.add(task)
+            task.add_done_callback(self.delete_tasks.discard)
+        else:
+            await self.delete_ticket_channel(ticket_id, channel, reason, timings, started, delay=0)
 
-    async def check_auto_close_tickets(self):
-        """Проверка автозакрытия тикетов"""
-        await self.bot.wait_until_ready()
-        
-        while not self.bot.is_closed():
-            try:
-                async with aiosqlite.connect(self.path) as db:
-                    tickets = await db.execute("""
-                        SELECT t.id, t.channel_id, t.guild_id, t.created_at, c.auto_close_hours 
-                        FROM tickets t 
-                        JOIN ticket_config c ON t.guild_id = c.guild_id 
-                        WHERE t.status = 'open' AND c.auto_close_hours > 0
-                    """).fetchall()
-                    
-                    for ticket in tickets:
-                        ticket_id, channel_id, guild_id, created_at_str, auto_close_hours = ticket
-                        
-                        created_at = datetime.strptime(created_at_str, "%Y-%m-%d %H:%M:%S")
-                        now = datetime.now()
-                        
-                        if (now - created_at).total_seconds() > (auto_close_hours * 3600):
-                            channel = self.bot.get_channel(channel_id)
-                            if channel:
-                                await self.process_ticket_close(
-                                    ticket_id, channel, self.bot.user.id, 
-                                    f"Автоматическое закрытие (неактивность более {auto_close_hours} часов)"
-                                )
-            
-            except Exception as e:
-                print(f"Ошибка в проверке автозакрытия: {e}")
+    async def delete_ticket_channel(self, ticket_id, channel, reason, timings, started, delay=CLOSE_DELAY):
+        """Одно сообщение с отсчетом, затем удаление канала"""
+        try:
+            if delay:
+                delete_at = int(time.time()) + delay
+                embed = disnake.Embed(
+                    title="🔒 Тикет закрыт",
+                    description=f"**Причина:** {reason}\n\nКанал будет удален <t:{delete_at}:R>.",
+                    color=disnake.Color.red()
+                )
+                message = await channel.send(embed=embed)
+                await asyncio.sleep(delay)
+                
+                embed.description = f"**Причина:** {reason}\n\nКанал удаляется..."
+                await message.edit(embed=embed)
             
-            await asyncio.sleep(3600)
+            deleting = time.perf_counter()
+            await channel.delete()
+            timings["delete"] = time.perf_counter() - deleting
+            timings["total"] = time.perf_counter() - started
+            self.close_timings.append(timings)
+        except Exception as e:
+            print(f"Ошибка при удалении канала тикета #{ticket_id}: {e}")
+        finally:
+            self.closing.discard(ticket_id)
 
     @commands.Cog.listener()
     async def on_button_click(self, inter: disnake.MessageInteraction):
@@ -548,79 +835,75 @@ class TicketSystem(commands.Cog):
         if inter.custom_id == "ticket_close_modal":
             reason = inter.text_values["reason"] or "Не указана"
             
-            async with aiosqlite.connect(self.path) as db:
-                ticket = await db.execute(
-                    "SELECT * FROM tickets WHERE channel_id = ?", (inter.channel.id,)
-                ).fetchone()
-                
-                if not ticket:
-                    await inter.response.send_message("❌ Тикет не найден.", ephemeral=True)
-                    return
-                
-                await self.process_ticket_close(ticket[0], inter.channel, inter.author.id, reason)
-                await inter.response.defer()
+            ticket_id = self.open_tickets.get(inter.channel.id)
+            if ticket_id is None:
+                await inter.response.send_message("❌ Тикет не найден.", ephemeral=True)
+                return
+            
+            # Отвечаем сразу, закрытие идет в очереди
+            await inter.response.defer()
+            self.enqueue_close(ticket_id, inter.channel, inter.author.id, reason)
 
     async def handle_ticket_creation(self, inter: disnake.MessageInteraction, ticket_type):
         """Обработка создания тикета"""
+        # Отвечаем сразу: создание канала может занять дольше 3 секунд
+        await inter.response.defer(with_message=True, ephemeral=True)
         config = await self.get_ticket_config(inter.guild.id)
         
         # Проверка кд
-        user_cooldown = self.ticket_cooldowns.get(inter.author.id)
-        if user_cooldown and (datetime.now() - user_cooldown).total_seconds() < config['ticket_cooldown']:
-            remaining = config['ticket_cooldown'] - int((datetime.now() - user_cooldown).total_seconds())
-            await inter.response.send_message(
-                f"❌ Подождите {remaining} секунд перед созданием нового тикета.",
-                ephemeral=True
-            )
+        cooldown_key = f"{inter.guild.id}:{inter.author.id}"
+        remaining = math.ceil(self.ticket_cooldowns.remaining(cooldown_key))
+        if remaining:
+            await inter.edit_original_response(f"❌ Подождите {remaining} секунд перед созданием нового тикета.")
             return
         
         # Проверка лимита тикетов
         user_tickets = await self.get_user_tickets_count(inter.guild.id, inter.author.id)
-        if user_tickets >= config['max_tickets_per_user']:
-            await inter.response.send_message(
-                f"❌ У вас уже {user_tickets} открытых тикетов. Максимум: {config['max_tickets_per_user']}.",
-                ephemeral=True
+        if user_tickets >= config.max_tickets_per_user:
+            await inter.edit_original_response(
+                f"❌ У вас уже {user_tickets} открытых тикетов. Максимум: {config.max_tickets_per_user}."
             )
             return
         
         # Создаем тикет
-        if not config['category_id']:
-            await inter.response.send_message("❌ Система тикетов не настроена.", ephemeral=True)
+        if not config.category_id:
+            await inter.edit_original_response("❌ Система тикетов не настроена.")
             return
         
-        category = inter.guild.get_channel(config['category_id'])
+        category = inter.guild.get_channel(config.category_id)
         if not category:
-            await inter.response.send_message("❌ Категория тикетов не найдена.", ephemeral=True)
+            await inter.edit_original_response("❌ Категория тикетов не найдена.")
             return
         
+        # Права задаются сразу при создании канала, поверх прав категории
+        overwrites = dict(category.overwrites)
+        overwrites[inter.guild.default_role] = disnake.PermissionOverwrite(read_messages=False)
+        overwrites[inter.author] = disnake.PermissionOverwrite(read_messages=True, send_messages=True)
+        if config.support_role_id:
+            support_role = inter.guild.get_role(config.support_role_id)
+            if support_role:
+                overwrites[support_role] = disnake.PermissionOverwrite(read_messages=True, send_messages=True)
+        
         # Создаем канал тикета
         ticket_channel = await inter.guild.create_text_channel(
             name=f"ticket-{inter.author.name}-{datetime.now().strftime('%d%m')}",
             category=category,
-            topic=f"Тикет пользователя {inter.author.name} | Тип: {ticket_type}"
+            topic=f"Тикет пользователя {inter.author.name} | Тип: {ticket_type}",
+            overwrites=overwrites
         )
         
-        # Настраиваем права
-        await ticket_channel.set_permissions(inter.author, read_messages=True, send_messages=True)
-        await ticket_channel.set_permissions(inter.guild.default_role, read_messages=False)
-        
-        if config['support_role_id']:
-            support_role = inter.guild.get_role(config['support_role_id'])
-            if support_role:
-                await ticket_channel.set_permissions(support_role, read_messages=True, send_messages=True)
-        
         # Создаем запись в БД
         ticket_id = await self.create_ticket(inter.guild.id, inter.author.id, ticket_channel.id, ticket_type)
         
         # Устанавливаем кд
-        self.ticket_cooldowns[inter.author.id] = datetime.now()
+        self.ticket_cooldowns.start(cooldown_key, config.ticket_cooldown)
         
-        # Отправляем приветственное сообщение
+        # Приветствие и упоминания одним сообщением
         view = TicketActionsView()
         
         embed = disnake.Embed(
             title=f"🎫 Тикет #{ticket_id}",
-            description=config['welcome_message'],
+            description=config.welcome_message,
             color=disnake.Color.green()
         )
         embed.add_field(name="👤 Автор", value=inter.author.mention, inline=True)
@@ -628,17 +911,14 @@ class TicketSystem(commands.Cog):
         embed.add_field(name="🔖 Тип", value=ticket_type.capitalize(), inline=True)
         embed.set_footer(text="Тикет будет автоматически закрыт через 24 часа неактивности")
         
-        await ticket_channel.send(embed=embed, view=view)
-        await ticket_channel.send(f"{inter.author.mention} {f'<@&{config['support_role_id']}>' if config['support_role_id'] else ''}")
+        mentions = f"{inter.author.mention} {f'<@&{config.support_role_id}>' if config.support_role_id else ''}"
+        await ticket_channel.send(mentions, embed=embed, view=view)
         
-        await inter.response.send_message(
-            f"✅ Тикет создан: {ticket_channel.mention}",
-            ephemeral=True
-        )
+        await inter.edit_original_response(f"✅ Тикет создан: {ticket_channel.mention}")
         
         # Логируем создание
-        if config['log_channel_id']:
-            log_channel = inter.guild.get_channel(config['log_channel_id'])
+        if config.log_channel_id:
+            log_channel = inter.guild.get_channel(config.log_channel_id)
             if log_channel:
                 embed = disnake.Embed(
                     title="🎫 Новый тикет",
@@ -652,32 +932,31 @@ class TicketSystem(commands.Cog):
 
     async def handle_ticket_accept(self, inter: disnake.MessageInteraction):
         """Обработка принятия тикета"""
-        async with aiosqlite.connect(self.path) as db:
-            ticket = await db.execute(
-                "SELECT * FROM tickets WHERE channel_id = ?", (inter.channel.id,)
-            ).fetchone()
-            
-            if not ticket:
-                await inter.response.send_message("❌ Тикет не найден.", ephemeral=True)
-                return
-            
-            if ticket[5]:  # moderator_id
-                await inter.response.send_message(
-                    f"❌ Тикет уже принят пользователем <@{ticket[5]}>.",
-                    ephemeral=True
-                )
-                return
-            
-            await self.add_ticket_moderator(ticket[0], inter.author.id)
-            
-            embed = disnake.Embed(
-                title="✅ Тикет принят",
-                description=f"Модератор {inter.author.mention} принял тикет.",
-                color=disnake.Color.green()
+        ticket = await self.get_ticket_by_channel(inter.channel.id)
+        
+        if not ticket:
+            await inter.response.send_message("❌ Тикет не найден.", ephemeral=True)
+            return
+        
+        if ticket.moderator_id:
+            await inter.response.send_message(
+                f"❌ Тикет уже принят пользователем <@{ticket.moderator_id}>.",
+                ephemeral=True
             )
-            await inter.channel.send(embed=embed)
-            
-            await inter.response.send_message("✅ Вы приняли тикет.", ephemeral=True)
+            return
+        
+        if not await self.add_ticket_moderator(ticket.id, inter.author.id):
+            await inter.response.send_message("❌ Тикет уже принят.", ephemeral=True)
+            return
+        
+        embed = disnake.Embed(
+            title="✅ Тикет принят",
+            description=f"Модератор {inter.author.mention} принял тикет.",
+            color=disnake.Color.green()
+        )
+        await inter.channel.send(embed=embed)
+        
+        await inter.response.send_message("✅ Вы приняли тикет.", ephemeral=True)
 
 class TicketCreateView(View):
     """View для создания тикета с выбором типа"""
@@ -688,7 +967,7 @@ class TicketCreateView(View):
         self.config = config
         
         # Добавляем кнопки для каждого типа тикета
-        for ticket_type in self.config['ticket_types']:
+        for ticket_type in self.config.ticket_types:
             emoji = self.get_emoji_for_type(ticket_type)
             button = Button(
                 label=ticket_type.capitalize(),
@@ -0,0 +1,10 @@
+from .models import LogSettings, Ticket, TicketConfig, TempChannelSetup, TempVoice, Warn, Punishment
+from .pool import Storage
+from .profiles import PROFILES, DEFAULT_PROFILE, resolve_profile
+
+DEFAULT_PATH = "v1rago/dbs/file.db"
+
+__all__ = [
+    "Storage", "DEFAULT_PATH", "PROFILES", "DEFAULT_PROFILE", "resolve_profile",
+    "LogSettings", "Ticket", "TicketConfig", "TempChannelSetup", "TempVoice", "Warn", "Punishment",
+]
@@ -0,0 +1,68 @@
+"""Бенчмарк профилей базы: вставок в секунду для log_punishment и create_ticket.
+
+Запуск: python -m storage.bench --rows 2000 --profiles default,balanced
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+from .pool import Storage
+from .profiles import PROFILES
+
+
+async def bench_profile(profile, rows):
+    # Импорт здесь, чтобы storage не зависел от disnake при обычном использовании
+    from cogs.mod import Moderation
+    from cogs.tickets import TicketSystem
+
+    with tempfile.TemporaryDirectory() as folder:
+        storage = Storage(os.path.join(folder, "bench.db"), profile=profile)
+        bot = SimpleNamespace(storage=storage)
+        moderation = Moderation(bot)
+        tickets = TicketSystem(bot)
+        await storage.open()
+
+        results = {}
+
+        start = time.perf_counter()
+        for i in range(rows):
+            await moderation.log_punishment(1, i, 2, "warn", None, "bench")
+        # log_punishment не ждет коммита, поэтому дожидаемся очереди
+        await storage.writes.close()
+        results["log_punishment"] = rows / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for i in range(rows):
+            await tickets.create_ticket(1, i, i, "general")
+        results["create_ticket"] = rows / (time.perf_counter() - start)
+
+        # Конкурентная запись, как при одновременной работе нескольких когов
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            moderation.log_punishment(1, i, 2, "warn", None, "bench") if i % 2 else
+            tickets.create_ticket(1, i, i, "general")
+            for i in range(rows)
+        ))
+        await storage.writes.close()
+        results["concurrent"] = rows / (time.perf_counter() - start)
+
+        await storage.close()
+        return results
+
+
+async def main(profiles, rows):
+    print(f"{'профиль':<10} {'log_punishment':>16} {'create_ticket':>15} {'concurrent':>12}  (вставок/сек, {rows} строк)")
+    for profile in profiles:
+        results = await bench_profile(profile, rows)
+        print(f"{profile:<10} {results['log_punishment']:>16.0f} {results['create_ticket']:>15.0f} {results['concurrent']:>12.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--profiles", default=",".join(PROFILES))
+    args = parser.parse_args()
+    asyncio.run(main(args.profiles.split(","), args.rows))
@@ -0,0 +1,291 @@
+from .search import index_legacy as index_legacy_transcripts
+from .sla import backfill as backfill_sla
+from .transcripts import migrate_legacy as migrate_legacy_transcripts
+
+# Версионированная схема базы. Новые изменения добавляются только в конец списка;
+# уже примененные миграции не редактируются. Шаг миграции - SQL-строка или
+# async-функция, которая получает соединение.
+MIGRATIONS = [
+    # 1: исходные таблицы, раньше создавались в init_db каждого кога
+    (1, [
+        """CREATE TABLE IF NOT EXISTS logs (
+            guild_id INTEGER PRIMARY KEY,
+            channel_id INTEGER DEFAULT NULL,
+            log_messages INTEGER DEFAULT 1,
+            log_moderation INTEGER DEFAULT 1,
+            log_voice INTEGER DEFAULT 1,
+            log_members INTEGER DEFAULT 1,
+            log_tickets INTEGER DEFAULT 1
+        )""",
+        """CREATE TABLE IF NOT EXISTS warnings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            moderator_id INTEGER NOT NULL,
+            reason TEXT,
+            time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            active TEXT DEFAULT "true"
+        )""",
+        """CREATE TABLE IF NOT EXISTS punishments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            moderator_id INTEGER NOT NULL,
+            action_type TEXT NOT NULL,
+            duration TEXT,
+            reason TEXT,
+            time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            guild_id INTEGER NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS tempchannels (
+            guild_id INTEGER PRIMARY KEY,
+            category_id INTEGER DEFAULT NULL,
+            settings_channel_id INTEGER DEFAULT NULL,
+            mother_channel_id INTEGER DEFAULT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS tempvoiceusers (
+            creator_id INTEGER PRIMARY KEY,
+            channel_id INTEGER,
+            owner_id INTEGER,
+            max_users INTEGER DEFAULT NULL,
+            is_private TEXT DEFAULT "true",
+            name TEXT,
+            bitrate INTEGER DEFAULT 64000,
+            banned_users_ids TEXT DEFAULT NULL,
+            deafened_users_ids TEXT DEFAULT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS tickets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            author_id INTEGER,
+            created_at TEXT,
+            status TEXT DEFAULT 'open',
+            channel_id INTEGER,
+            moderator_id INTEGER DEFAULT NULL,
+            guild_id INTEGER,
+            ticket_type TEXT DEFAULT 'general',
+            closed_at TEXT DEFAULT NULL,
+            close_reason TEXT DEFAULT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS ticket_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ticket_id INTEGER,
+            author_id INTEGER,
+            message TEXT,
+            created_at TEXT,
+            attachments TEXT DEFAULT NULL,
+            FOREIGN KEY (ticket_id) REFERENCES tickets(id) ON DELETE CASCADE
+        )""",
+        """CREATE TABLE IF NOT EXISTS transcripts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ticket_id INTEGER,
+            content TEXT,
+            created_at TEXT,
+            FOREIGN KEY (ticket_id) REFERENCES tickets(id) ON DELETE CASCADE
+        )""",
+        """CREATE TABLE IF NOT EXISTS ticket_config (
+            guild_id INTEGER PRIMARY KEY,
+            category_id INTEGER DEFAULT NULL,
+            create_channel_id INTEGER DEFAULT NULL,
+            create_message_id INTEGER DEFAULT NULL,
+            log_channel_id INTEGER DEFAULT NULL,
+            support_role_id INTEGER DEFAULT NULL,
+            max_tickets_per_user INTEGER DEFAULT 3,
+            ticket_cooldown INTEGER DEFAULT 300,
+            require_topic BOOLEAN DEFAULT 0,
+            auto_close_hours INTEGER DEFAULT 24,
+            welcome_message TEXT DEFAULT 'Спасибо за обращение! Ожидайте ответа модератора.',
+            ticket_types TEXT DEFAULT 'general,report,bug,support'
+        )""",
+        """CREATE TABLE IF NOT EXISTS ticket_topics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER,
+            name TEXT,
+            description TEXT,
+            emoji TEXT DEFAULT '🎫'
+        )""",
+    ]),
+    # 2: индексы под горячие запросы
+    (2, [
+        # close / accept / add / remove ищут тикет по каналу
+        "CREATE INDEX IF NOT EXISTS idx_tickets_channel ON tickets (channel_id)",
+        # лимит открытых тикетов пользователя
+        "CREATE INDEX IF NOT EXISTS idx_tickets_guild_author_status ON tickets (guild_id, author_id, status)",
+        # счетчик и список активных предупреждений
+        "CREATE INDEX IF NOT EXISTS idx_warnings_user_active ON warnings (user_id, active, time)",
+        # история наказаний, отсортированная по времени
+        "CREATE INDEX IF NOT EXISTS idx_punishments_user_guild_time ON punishments (user_id, guild_id, time)",
+        # удаление пустых временных каналов
+        "CREATE INDEX IF NOT EXISTS idx_tempvoiceusers_channel ON tempvoiceusers (channel_id)",
+    ]),
+    # 3: списки банов и заглушенных во временных каналах - отдельной таблицей вместо строк через запятую
+    (3, [
+        """CREATE TABLE IF NOT EXISTS tempvoice_members (
+            channel_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            PRIMARY KEY (channel_id, kind, user_id)
+        ) WITHOUT ROWID""",
+        # Переносим старые значения, разбирая строки рекурсивным CTE
+        """WITH RECURSIVE split(channel_id, kind, item, rest) AS (
+            SELECT channel_id, 'ban', '', banned_users_ids || ','
+            FROM tempvoiceusers WHERE banned_users_ids IS NOT NULL
+            UNION ALL
+            SELECT channel_id, 'deafen', '', deafened_users_ids || ','
+            FROM tempvoiceusers WHERE deafened_users_ids IS NOT NULL
+            UNION ALL
+            SELECT channel_id, kind,
+                   trim(substr(rest, 1, instr(rest, ',') - 1)),
+                   substr(rest, instr(rest, ',') + 1)
+            FROM split WHERE rest != ''
+        )
+        INSERT OR IGNORE INTO tempvoice_members (channel_id, kind, user_id)
+        SELECT channel_id, kind, CAST(item AS INTEGER) FROM split
+        WHERE item != '' AND channel_id IS NOT NULL""",
+        "ALTER TABLE tempvoiceusers DROP COLUMN banned_users_ids",
+        "ALTER TABLE tempvoiceusers DROP COLUMN deafened_users_ids",
+    ]),
+    # 4: транскрипты сжатыми кусками, одинаковые тексты хранятся один раз
+    (4, [
+        """CREATE TABLE IF NOT EXISTS transcript_chunks (
+            content_hash TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            PRIMARY KEY (content_hash, seq)
+        )""",
+        "ALTER TABLE transcripts ADD COLUMN content_hash TEXT",
+        "ALTER TABLE transcripts ADD COLUMN size INTEGER",
+        migrate_legacy_transcripts,
+        "CREATE INDEX IF NOT EXISTS idx_transcripts_ticket ON transcripts (ticket_id)",
+    ]),
+    # 5: сообщения тикетов пишутся по мере поступления, транскрипт собирается из базы
+    (5, [
+        "ALTER TABLE ticket_messages ADD COLUMN message_id INTEGER",
+        "ALTER TABLE ticket_messages ADD COLUMN author_name TEXT",
+        "CREATE INDEX IF NOT EXISTS idx_ticket_messages_ticket ON ticket_messages (ticket_id, message_id)",
+    ]),
+    # 6: полнотекстовый поиск по тикетам; rowid документа = id тикета
+    (6, [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS ticket_search USING fts5 (content, tokenize = 'unicode61')",
+        index_legacy_transcripts,
+    ]),
+    # 7: счетчики тикетов по серверам; триггеры обновляют их в той же транзакции,
+    # что и создание или закрытие тикета. kind: total / type / day / author
+    (7, [
+        """CREATE TABLE IF NOT EXISTS ticket_stats (
+            guild_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            opened INTEGER NOT NULL DEFAULT 0,
+            closed INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, kind, key)
+        ) WITHOUT ROWID""",
+        # топ авторов
+        "CREATE INDEX IF NOT EXISTS idx_ticket_stats_rank ON ticket_stats (guild_id, kind, opened)",
+        """CREATE TRIGGER IF NOT EXISTS ticket_stats_open AFTER INSERT ON tickets BEGIN
+            INSERT INTO ticket_stats (guild_id, kind, key, opened) VALUES
+                (NEW.guild_id, 'total', '', 1),
+                (NEW.guild_id, 'type', ifnull(NEW.ticket_type, 'general'), 1),
+                (NEW.guild_id, 'day', ifnull(date(NEW.created_at), ''), 1),
+                (NEW.guild_id, 'author', ifnull(NEW.author_id, ''), 1)
+            ON CONFLICT (guild_id, kind, key) DO UPDATE SET opened = opened + 1;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS ticket_stats_close AFTER UPDATE OF status ON tickets
+        WHEN NEW.status = 'closed' AND OLD.status IS NOT 'closed' BEGIN
+            INSERT INTO ticket_stats (guild_id, kind, key, closed) VALUES
+                (NEW.guild_id, 'total', '', 1),
+                (NEW.guild_id, 'type', ifnull(NEW.ticket_type, 'general'), 1),
+                (NEW.guild_id, 'day', ifnull(date(NEW.closed_at), ''), 1),
+                (NEW.guild_id, 'author', ifnull(NEW.author_id, ''), 1)
+            ON CONFLICT (guild_id, kind, key) DO UPDATE SET closed = closed + 1;
+        END""",
+        # Заполняем счетчики по уже существующим тикетам
+        """INSERT INTO ticket_stats (guild_id, kind, key, opened, closed)
+        SELECT guild_id, kind, key, SUM(opened), SUM(closed) FROM (
+            SELECT guild_id, 'total' AS kind, '' AS key, 1 AS opened, status = 'closed' AS closed FROM tickets
+            UNION ALL
+            SELECT guild_id, 'type', ifnull(ticket_type, 'general'), 1, status = 'closed' FROM tickets
+            UNION ALL
+            SELECT guild_id, 'author', ifnull(author_id, ''), 1, status = 'closed' FROM tickets
+            UNION ALL
+            SELECT guild_id, 'day', ifnull(date(created_at), ''), 1, 0 FROM tickets
+            UNION ALL
+            SELECT guild_id, 'day', ifnull(date(closed_at), ''), 0, 1 FROM tickets WHERE status = 'closed'
+        ) WHERE guild_id IS NOT NULL
+        GROUP BY guild_id, kind, key""",
+    ]),
+    # 8: кулдауны переживают перезапуск бота
+    (8, [
+        """CREATE TABLE IF NOT EXISTS cooldowns (
+            scope TEXT NOT NULL,
+            key NOT NULL,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (scope, key)
+        ) WITHOUT ROWID""",
+    ]),
+    # 9: время принятия тикета и гистограммы времени принятия / закрытия.
+    # dim: guild / type / moderator, bucket - логарифмическая корзина (см. storage/sla.py)
+    (9, [
+        "ALTER TABLE tickets ADD COLUMN accepted_at TEXT DEFAULT NULL",
+        """CREATE TABLE IF NOT EXISTS ticket_sla (
+            guild_id INTEGER NOT NULL,
+            metric TEXT NOT NULL,
+            dim TEXT NOT NULL,
+            key NOT NULL,
+            bucket INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, metric, dim, key, bucket)
+        ) WITHOUT ROWID""",
+        backfill_sla,
+    ]),
+    # 10: логи можно отправлять через вебхук канала вместо сообщений бота
+    (10, [
+        "ALTER TABLE logs ADD COLUMN output TEXT DEFAULT 'channel'",
+        "ALTER TABLE logs ADD COLUMN webhook_url TEXT DEFAULT NULL",
+    ]),
+    # 11: завершенные голосовые сессии (путь по каналам и длительность в секундах)
+    (11, [
+        """CREATE TABLE IF NOT EXISTS voice_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            channel_path TEXT,
+            started_at TEXT NOT NULL,
+            ended_at TEXT NOT NULL,
+            duration INTEGER NOT NULL
+        )""",
+        # время участника и топ сервера за период
+        "CREATE INDEX IF NOT EXISTS idx_voice_sessions_user ON voice_sessions (guild_id, user_id, started_at)",
+        "CREATE INDEX IF NOT EXISTS idx_voice_sessions_guild ON voice_sessions (guild_id, started_at)",
+    ]),
+]
+
+
+async def migrate(conn):
+    """Применить недостающие миграции и вернуть текущую версию схемы"""
+    await conn.execute("""CREATE TABLE IF NOT EXISTS schema_version (
+                       version INTEGER PRIMARY KEY,
+                       applied_at TEXT DEFAULT CURRENT_TIMESTAMP)""")
+    await conn.commit()
+
+    async with conn.execute("SELECT MAX(version) FROM schema_version") as cursor:
+        row = await cursor.fetchone()
+    current = row[0] or 0
+
+    for version, statements in MIGRATIONS:
+        if version <= current:
+            continue
+
+        # Каждая миграция применяется целиком или не применяется вовсе
+        await conn.execute("BEGIN")
+        try:
+            for step in statements:
+                if callable(step):
+                    await step(conn)
+                else:
+                    await conn.execute(step)
+            await conn.execute("INSERT INTO schema_version (version) VALUES (?)", (version,))
+            await conn.commit()
+        except Exception:
+            await conn.rollback()
+            raise
+        current = version
+
+    return current
@@ -0,0 +1,121 @@
+from dataclasses import dataclass, fields
+from typing import ClassVar
+
+
+class Model:
+    """Строка таблицы: явный список колонок вместо SELECT * и индексов кортежа"""
+
+    __slots__ = ()
+
+    TABLE: ClassVar[str] = ""
+    COLUMNS: ClassVar[str] = ""
+
+    @classmethod
+    def select(cls, where=""):
+        return f"SELECT {cls.COLUMNS} FROM {cls.TABLE} {where}".rstrip()
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row)
+
+
+def model(table):
+    """Сделать из класса компактную неизменяемую модель строки таблицы"""
+    def wrap(cls):
+        cls = dataclass(frozen=True, slots=True)(cls)
+        cls.TABLE = table
+        cls.COLUMNS = ", ".join(field.name for field in fields(cls))
+        return cls
+    return wrap
+
+
+@model("tickets")
+class Ticket(Model):
+    id: int
+    author_id: int
+    created_at: str
+    status: str
+    channel_id: int
+    moderator_id: int
+    guild_id: int
+    ticket_type: str
+    closed_at: str
+    close_reason: str
+    accepted_at: str = None
+
+
+@model("ticket_config")
+class TicketConfig(Model):
+    guild_id: int
+    category_id: int = None
+    create_channel_id: int = None
+    create_message_id: int = None
+    log_channel_id: int = None
+    support_role_id: int = None
+    max_tickets_per_user: int = 3
+    ticket_cooldown: int = 300
+    require_topic: bool = False
+    auto_close_hours: int = 24
+    welcome_message: str = 'Спасибо за обращение! Ожидайте ответа модератора.'
+    # Хранится в базе строкой через запятую, в модели - уже разобранным кортежем
+    ticket_types: tuple = ('general',)
+
+    @classmethod
+    def from_row(cls, row):
+        *values, require_topic, auto_close_hours, welcome_message, ticket_types = row
+        return cls(*values, bool(require_topic), auto_close_hours, welcome_message,
+                   tuple(ticket_types.split(',')) if ticket_types else ('general',))
+
+
+@model("tempchannels")
+class TempChannelSetup(Model):
+    guild_id: int
+    category_id: int
+    settings_channel_id: int
+    mother_channel_id: int
+
+
+@model("tempvoiceusers")
+class TempVoice(Model):
+    creator_id: int
+    channel_id: int
+    owner_id: int
+    max_users: int
+    is_private: str
+    name: str
+    bitrate: int
+
+
+@model("logs")
+class LogSettings(Model):
+    guild_id: int
+    channel_id: int = None
+    log_messages: int = 1
+    log_moderation: int = 1
+    log_voice: int = 1
+    log_members: int = 1
+    log_tickets: int = 1
+    output: str = "channel"
+    webhook_url: str = None
+
+
+@model("warnings")
+class Warn(Model):
+    id: int
+    user_id: int
+    moderator_id: int
+    reason: str
+    time: str
+    active: str
+
+
+@model("punishments")
+class Punishment(Model):
+    id: int
+    user_id: int
+    moderator_id: int
+    action_type: str
+    duration: str
+    reason: str
+    time: str
+    guild_id: int
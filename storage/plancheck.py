@@ -0,0 +1,52 @@
+"""Проверка планов горячих запросов: каждый должен идти по индексу без временного B-дерева.
+
+Запуск: python -m storage.plancheck (код выхода 1, если какой-то план испортился)
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+from .models import Punishment, Ticket, Warn
+from .pool import Storage
+
+# Запрос в том виде, в каком его выполняют коги -> индекс, который он обязан использовать
+HOT_QUERIES = [
+    (Ticket.select("WHERE channel_id = ?"), (1,), "idx_tickets_channel"),
+    ("SELECT COUNT(*) FROM tickets WHERE guild_id = ? AND author_id = ? AND status = 'open'", (1, 2),
+     "idx_tickets_guild_author_status"),
+    (Warn.select("WHERE user_id = ? AND active = 'true' ORDER BY time DESC"), (1,), "idx_warnings_user_active"),
+    (Punishment.select("WHERE user_id = ? AND guild_id = ? ORDER BY time DESC LIMIT 20"), (1, 2),
+     "idx_punishments_user_guild_time"),
+    ("SELECT creator_id FROM tempvoiceusers WHERE channel_id = ?", (1,), "idx_tempvoiceusers_channel"),
+]
+
+
+def check_plan(plan, index):
+    """Пустая строка, если план правильный, иначе описание проблемы"""
+    details = [row[3] for row in plan]
+    if not any(detail.startswith("SEARCH") and f"INDEX {index} " in f"{detail} " for detail in details):
+        return f"нет SEARCH по {index}: {details}"
+    if any("USE TEMP B-TREE" in detail for detail in details):
+        return f"временное B-дерево: {details}"
+    return ""
+
+
+async def main():
+    failed = 0
+    with tempfile.TemporaryDirectory() as folder:
+        storage = Storage(os.path.join(folder, "plancheck.db"))
+        await storage.open()
+        try:
+            for sql, params, index in HOT_QUERIES:
+                plan = await storage.fetchall(f"EXPLAIN QUERY PLAN {sql}", params)
+                problem = check_plan(plan, index)
+                print(f"{'FAIL' if problem else 'ok':<5} {index}" + (f"  {problem}" if problem else ""))
+                failed += bool(problem)
+        finally:
+            await storage.close()
+    return failed
+
+
+if __name__ == "__main__":
+    sys.exit(1 if asyncio.run(main()) else 0)
@@ -0,0 +1,144 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+import aiosqlite
+
+from .migrations import migrate
+from .profiles import apply_profile, resolve_profile
+from .writebehind import WriteBehindQueue
+
+
+class Storage:
+    """Общий пул соединений с базой: один писатель и несколько читателей"""
+
+    def __init__(self, path, readers=3, profile=None, batch_rows=100, batch_interval=0.0):
+        self.path = path
+        self.readers = readers
+        self.pragmas = resolve_profile(profile)
+        self.writes = WriteBehindQueue(self, batch_rows, batch_interval)
+        self._writer = None
+        self._pool = []
+        self._idle = asyncio.Queue()
+        self._write_lock = asyncio.Lock()
+        self._open_lock = asyncio.Lock()
+
+    @property
+    def is_open(self):
+        return self._writer is not None
+
+    async def _connect(self):
+        conn = await aiosqlite.connect(self.path)
+        await apply_profile(conn, self.pragmas)
+        await conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    async def open(self):
+        """Открыть соединения и применить миграции (повторный вызов ничего не делает)"""
+        async with self._open_lock:
+            if self._writer is not None:
+                return
+
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+
+            self._writer = await self._connect()
+            await migrate(self._writer)
+            for _ in range(self.readers):
+                conn = await self._connect()
+                self._pool.append(conn)
+                self._idle.put_nowait(conn)
+
+    async def close(self):
+        """Дождаться текущих запросов и закрыть все соединения"""
+        await self.writes.close()
+
+        async with self._open_lock:
+            if self._writer is None:
+                return
+
+            async with self._write_lock:
+                await self._writer.close()
+                self._writer = None
+
+            # Забираем всех читателей обратно, чтобы не закрыть занятое соединение
+            for _ in self._pool:
+                conn = await self._idle.get()
+                await conn.close()
+            self._pool.clear()
+
+    @asynccontextmanager
+    async def read(self):
+        """Взять свободное соединение для чтения"""
+        if self._writer is None:
+            await self.open()
+
+        conn = await self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put_nowait(conn)
+
+    @asynccontextmanager
+    async def write(self):
+        """Эксклюзивный доступ к писателю; commit при выходе, rollback при ошибке"""
+        if self._writer is None:
+            await self.open()
+
+        async with self._write_lock:
+            try:
+                yield self._writer
+            except BaseException:
+                await self._writer.rollback()
+                raise
+            else:
+                await self._writer.commit()
+
+    async def fetchone(self, sql, params=()):
+        async with self.read() as db:
+            async with db.execute(sql, params) as cursor:
+                return await cursor.fetchone()
+
+    async def fetchall(self, sql, params=()):
+        async with self.read() as db:
+            return await db.execute_fetchall(sql, params)
+
+    async def executemany(self, sql, rows):
+        async with self.write() as db:
+            await db.executemany(sql, rows)
+
+    async def get(self, model, where="", params=()):
+        """Первая строка запроса в виде модели или None"""
+        row = await self.fetchone(model.select(where), params)
+        return model.from_row(row) if row else None
+
+    async def select(self, model, where="", params=()):
+        """Все строки запроса в виде списка моделей"""
+        rows = await self.fetchall(model.select(where), params)
+        return [model.from_row(row) for row in rows]
+
+    async def execute(self, sql, params=()):
+        """Выполнить запрос на запись и вернуть lastrowid"""
+        async with self.write() as db:
+            cursor = await db.execute(sql, params)
+            return cursor.lastrowid
+
+    async def append(self, sql, params=()):
+        """Вставка через групповой коммит; возвращает lastrowid"""
+        return await self.writes.submit(sql, params)
+
+    async def flush(self):
+        """Дождаться, пока отложенные вставки попадут в базу"""
+        await self.writes.flush()
+
+    def append_nowait(self, sql, params=()):
+        """Вставка через групповой коммит без ожидания результата"""
+        future = self.writes.submit(sql, params)
+        future.add_done_callback(_report_failure)
+        return future
+
+
+def _report_failure(future):
+    if not future.cancelled() and future.exception():
+        print(f"Ошибка отложенной записи в базу: {future.exception()}")
@@ -0,0 +1,50 @@
+# Наборы PRAGMA, которые применяются к каждому соединению при открытии.
+# journal_mode идет первым: остальные настройки зависят от режима журнала.
+PROFILES = {
+    # Настройки SQLite по умолчанию (для сравнения в бенчмарке)
+    "default": {},
+    # WAL + полный fsync на каждый коммит
+    "safe": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+        "cache_size": -16000,
+        "temp_store": "MEMORY",
+    },
+    # WAL + fsync только на чекпоинтах; при сбое питания теряется лишь последний коммит
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "cache_size": -16000,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+    # Без fsync вообще, только для тестов и бенчмарков
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "busy_timeout": 5000,
+        "cache_size": -64000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+}
+
+DEFAULT_PROFILE = "balanced"
+
+
+def resolve_profile(profile):
+    """Вернуть словарь PRAGMA по имени профиля или готовому словарю"""
+    if profile is None:
+        profile = DEFAULT_PROFILE
+    if isinstance(profile, dict):
+        return profile
+    if profile not in PROFILES:
+        raise ValueError(f"Неизвестный профиль базы: {profile}. Доступны: {', '.join(PROFILES)}")
+    return PROFILES[profile]
+
+
+async def apply_profile(conn, pragmas):
+    for name, value in pragmas.items():
+        await conn.execute(f"PRAGMA {name} = {value}")
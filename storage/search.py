@@ -0,0 +1,112 @@
+import codecs
+import zlib
+
+# Результатов на одной странице /ticket_search
+PAGE_SIZE = 5
+
+
+def build_query(text):
+    """Превратить пользовательский ввод в безопасный запрос FTS5.
+
+    Каждое слово берется в кавычки, поэтому операторы и спецсимволы FTS5 из ввода
+    не ломают запрос; слово со звездочкой на конце ищется как префикс.
+    """
+    terms = []
+    for word in text.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*").replace('"', '""')
+        if word:
+            terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+async def index_legacy(db):
+    """Миграция: проиндексировать уже сохраненные транскрипты закрытых тикетов"""
+    async with db.execute("""
+        SELECT t.ticket_id, t.content_hash FROM transcripts t
+        JOIN (SELECT ticket_id, MAX(id) AS id FROM transcripts GROUP BY ticket_id) last ON last.id = t.id
+        WHERE t.content_hash IS NOT NULL
+    """) as cursor:
+        latest = await cursor.fetchall()
+
+    for ticket_id, content_hash in latest:
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        parts = []
+        async with db.execute(
+            "SELECT data FROM transcript_chunks WHERE content_hash = ? ORDER BY seq", (content_hash,)
+        ) as cursor:
+            async for (data,) in cursor:
+                parts.append(decoder.decode(zlib.decompress(data)))
+        parts.append(decoder.decode(b"", final=True))
+        await db.execute(
+            "INSERT INTO ticket_search (rowid, content) VALUES (?, ?)", (ticket_id, "".join(parts))
+        )
+
+
+class TicketSearch:
+    """Полнотекстовый поиск по транскриптам тикетов (FTS5, документ = тикет)"""
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    async def index(self, ticket_id, source):
+        """Добавить или обновить текст тикета в индексе; source - строка или бинарный файл"""
+        if not isinstance(source, str):
+            source.seek(0)
+            data = source.read()
+            source.seek(0)
+            source = data.decode("utf-8")
+
+        async with self.storage.write() as db:
+            await db.execute("DELETE FROM ticket_search WHERE rowid = ?", (ticket_id,))
+            await db.execute(
+                "INSERT INTO ticket_search (rowid, content) VALUES (?, ?)", (ticket_id, source)
+            )
+
+    async def search(self, guild_id, text, ticket_type=None, author_id=None,
+                     since=None, until=None, page=1):
+        """Найти тикеты сервера; вернуть (всего найдено, строки текущей страницы).
+
+        Строка: (id, author_id, ticket_type, status, created_at, closed_at, фрагмент).
+        Даты - строки в формате created_at тикета, until не включается.
+        """
+        query = build_query(text)
+        if not query:
+            return 0, []
+
+        where = ["ticket_search MATCH ?", "t.guild_id = ?"]
+        params = [query, guild_id]
+        if ticket_type:
+            where.append("t.ticket_type = ?")
+            params.append(ticket_type)
+        if author_id:
+            where.append("t.author_id = ?")
+            params.append(author_id)
+        if since:
+            where.append("t.created_at >= ?")
+            params.append(since)
+        if until:
+            where.append("t.created_at < ?")
+            params.append(until)
+        condition = " AND ".join(where)
+
+        async with self.storage.read() as db:
+            async with db.execute(f"""
+                SELECT COUNT(*) FROM ticket_search JOIN tickets t ON t.id = ticket_search.rowid
+                WHERE {condition}
+            """, params) as cursor:
+                total = (await cursor.fetchone())[0]
+            if not total:
+                return 0, []
+
+            # rank - bm25, чем меньше, тем релевантнее
+            async with db.execute(f"""
+                SELECT t.id, t.author_id, t.ticket_type, t.status, t.created_at, t.closed_at,
+                       snippet(ticket_search, 0, '**', '**', '…', 16)
+                FROM ticket_search JOIN tickets t ON t.id = ticket_search.rowid
+                WHERE {condition}
+                ORDER BY rank
+                LIMIT ? OFFSET ?
+            """, [*params, PAGE_SIZE, (page - 1) * PAGE_SIZE]) as cursor:
+                rows = await cursor.fetchall()
+        return total, rows
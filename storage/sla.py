@@ -0,0 +1,88 @@
+import math
+from datetime import datetime
+
+# Границы корзин растут в BASE раз: оценка перцентиля ошибается не больше чем на 10%
+BASE = 1.1
+METRICS = ("accept", "close")
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def bucket_of(seconds):
+    """Номер корзины гистограммы для длительности в секундах"""
+    if seconds < 1:
+        return 0
+    return int(math.log(seconds) / math.log(BASE)) + 1
+
+
+def bucket_upper(bucket):
+    """Верхняя граница корзины в секундах"""
+    return BASE ** bucket
+
+
+def elapsed(start, end):
+    """Секунды между двумя отметками времени тикета"""
+    start = datetime.strptime(start, "%Y-%m-%d %H:%M:%S")
+    end = datetime.strptime(end, "%Y-%m-%d %H:%M:%S")
+    return max((end - start).total_seconds(), 0)
+
+
+async def record(db, guild_id, metric, ticket_type, moderator_id, seconds):
+    """Учесть длительность в гистограммах сервера, типа тикета и модератора.
+
+    Вызывается внутри транзакции, которая меняет сам тикет.
+    """
+    bucket = bucket_of(seconds)
+    await db.executemany(
+        """INSERT INTO ticket_sla (guild_id, metric, dim, key, bucket, count) VALUES (?, ?, ?, ?, ?, 1)
+        ON CONFLICT (guild_id, metric, dim, key, bucket) DO UPDATE SET count = count + 1""",
+        [
+            (guild_id, metric, "guild", "", bucket),
+            (guild_id, metric, "type", ticket_type or "general", bucket),
+            (guild_id, metric, "moderator", moderator_id or "", bucket),
+        ]
+    )
+
+
+async def backfill(db):
+    """Миграция: время закрытия уже закрытых тикетов (время принятия раньше не записывалось)"""
+    async with db.execute("""
+        SELECT guild_id, ticket_type, moderator_id, created_at, closed_at FROM tickets
+        WHERE status = 'closed' AND guild_id IS NOT NULL AND created_at IS NOT NULL AND closed_at IS NOT NULL
+    """) as cursor:
+        closed = await cursor.fetchall()
+    for guild_id, ticket_type, moderator_id, created_at, closed_at in closed:
+        await record(db, guild_id, "close", ticket_type, moderator_id, elapsed(created_at, closed_at))
+
+
+def percentiles(buckets):
+    """Перцентили QUANTILES по списку (корзина, количество), отсортированному по корзине"""
+    total = sum(count for _, count in buckets)
+    result = []
+    seen = 0
+    quantiles = iter(QUANTILES)
+    quantile = next(quantiles)
+    for bucket, count in buckets:
+        seen += count
+        while quantile is not None and seen >= quantile * total:
+            result.append(bucket_upper(bucket))
+            quantile = next(quantiles, None)
+    return total, result
+
+
+async def report(storage, guild_id, dim):
+    """Перцентили по каждому ключу измерения dim (guild / type / moderator).
+
+    Возвращает {ключ: {метрика: (количество, [p50, p90, p99])}} одним чтением гистограмм.
+    """
+    rows = await storage.fetchall(
+        """SELECT key, metric, bucket, count FROM ticket_sla
+        WHERE guild_id = ? AND dim = ? ORDER BY key, metric, bucket""",
+        (guild_id, dim)
+    )
+    series = {}
+    for key, metric, bucket, count in rows:
+        series.setdefault(key, {}).setdefault(metric, []).append((bucket, count))
+    return {
+        key: {metric: percentiles(buckets) for metric, buckets in metrics.items()}
+        for key, metrics in series.items()
+    }
@@ -0,0 +1,112 @@
+import asyncio
+import codecs
+import hashlib
+import io
+import zlib
+from datetime import datetime
+
+# Размер несжатого куска; каждый кусок сжимается отдельно, чтобы читать их по одному
+CHUNK_SIZE = 64 * 1024
+
+
+def pack(source):
+    """Разбить текст (строку или бинарный файл) на сжатые куски; вернуть (sha256, размер в байтах, куски)"""
+    if isinstance(source, str):
+        source = io.BytesIO(source.encode("utf-8"))
+    source.seek(0)
+
+    digest = hashlib.sha256()
+    size = 0
+    chunks = []
+    while data := source.read(CHUNK_SIZE):
+        digest.update(data)
+        size += len(data)
+        chunks.append(zlib.compress(data))
+    source.seek(0)
+    return digest.hexdigest(), size, chunks
+
+
+async def write_chunks(db, content_hash, chunks):
+    # Такой же текст уже лежит в базе - куски общие
+    async with db.execute(
+        "SELECT 1 FROM transcript_chunks WHERE content_hash = ? AND seq = 0", (content_hash,)
+    ) as cursor:
+        if await cursor.fetchone():
+            return
+    await db.executemany(
+        "INSERT INTO transcript_chunks (content_hash, seq, data) VALUES (?, ?, ?)",
+        [(content_hash, seq, chunk) for seq, chunk in enumerate(chunks)]
+    )
+
+
+async def migrate_legacy(db):
+    """Миграция: перенести старые транскрипты из transcripts.content в сжатые куски"""
+    # Старые транскрипты бывают по несколько мегабайт - в памяти держим только один
+    async with db.execute("SELECT id FROM transcripts WHERE content IS NOT NULL ORDER BY id") as cursor:
+        ids = [transcript_id for (transcript_id,) in await cursor.fetchall()]
+    for transcript_id in ids:
+        async with db.execute("SELECT content FROM transcripts WHERE id = ?", (transcript_id,)) as cursor:
+            (content,) = await cursor.fetchone()
+        content_hash, size, chunks = pack(content)
+        del content
+        await write_chunks(db, content_hash, chunks)
+        await db.execute(
+            "UPDATE transcripts SET content = NULL, content_hash = ?, size = ? WHERE id = ?",
+            (content_hash, size, transcript_id)
+        )
+
+
+class TranscriptStore:
+    """Сжатые транскрипты тикетов с дедупликацией по хэшу содержимого"""
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    async def save(self, ticket_id, source):
+        """Сохранить транскрипт; повторное сохранение того же текста не создает новую запись"""
+        # Сжатие многомегабайтных транскриптов не должно блокировать цикл событий
+        content_hash, size, chunks = await asyncio.to_thread(pack, source)
+
+        async with self.storage.write() as db:
+            await write_chunks(db, content_hash, chunks)
+
+            async with db.execute(
+                "SELECT content_hash FROM transcripts WHERE ticket_id = ? ORDER BY id DESC LIMIT 1", (ticket_id,)
+            ) as cursor:
+                last = await cursor.fetchone()
+            if last and last[0] == content_hash:
+                return content_hash
+
+            await db.execute(
+                "INSERT INTO transcripts (ticket_id, content_hash, size, created_at) VALUES (?, ?, ?, ?)",
+                (ticket_id, content_hash, size, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+        return content_hash
+
+    async def messages(self, ticket_id):
+        """Сообщения тикета по одному: (время, автор, текст, вложения)"""
+        async with self.storage.read() as db:
+            async with db.execute(
+                """SELECT created_at, author_name, message, attachments FROM ticket_messages
+                WHERE ticket_id = ? ORDER BY message_id""", (ticket_id,)
+            ) as cursor:
+                async for row in cursor:
+                    yield row
+
+    async def latest_hash(self, ticket_id):
+        row = await self.storage.fetchone(
+            "SELECT content_hash FROM transcripts WHERE ticket_id = ? ORDER BY id DESC LIMIT 1", (ticket_id,)
+        )
+        return row[0] if row else None
+
+    async def stream(self, content_hash):
+        """Отдавать текст транскрипта по кускам, не собирая его целиком в памяти"""
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        async with self.storage.read() as db:
+            async with db.execute(
+                "SELECT data FROM transcript_chunks WHERE content_hash = ? ORDER BY seq", (content_hash,)
+            ) as cursor:
+                async for (data,) in cursor:
+                    # Граница куска может разрезать многобайтовый символ - декодер это учитывает
+                    yield decoder.decode(zlib.decompress(data))
+        yield decoder.decode(b"", final=True)
@@ -0,0 +1,99 @@
+import asyncio
+
+
+class WriteBehindQueue:
+    """Очередь вставок с групповым коммитом: пачка из max_rows строк или за interval секунд.
+
+    При interval = 0 пачка не ждет таймера: коммитится всё, что накопилось,
+    пока шел предыдущий коммит, поэтому одиночная запись не получает задержки.
+    """
+
+    def __init__(self, storage, max_rows=100, interval=0.0):
+        self.storage = storage
+        self.max_rows = max_rows
+        self.interval = interval
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    def submit(self, sql, params=()):
+        """Поставить запрос в очередь; future получит lastrowid после коммита"""
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+
+        future = loop.create_future()
+        self._queue.put_nowait((sql, params, future))
+        return future
+
+    async def flush(self):
+        """Дождаться коммита всего, что было поставлено в очередь до этого вызова"""
+        if self._task and not self._task.done():
+            await self.submit(None)
+
+    async def close(self):
+        """Дописать всё из очереди и остановить фоновую задачу"""
+        if self._task and not self._task.done():
+            self._queue.put_nowait(None)
+            await self._task
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+
+            batch = [item]
+            stop = False
+            deadline = loop.time() + self.interval
+            # Даем одновременно запущенным корутинам успеть встать в очередь
+            await asyncio.sleep(0)
+            while len(batch) < self.max_rows:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            await self._commit(batch)
+            if stop:
+                return
+
+    async def _commit(self, batch):
+        try:
+            rowids = []
+            async with self.storage.write() as db:
+                for sql, params, _ in batch:
+                    # sql = None - метка flush(), ничего не выполняет
+                    cursor = await db.execute(sql, params) if sql else None
+                    rowids.append(cursor.lastrowid if cursor else None)
+        except Exception:
+            # Одна плохая строка не должна терять всю пачку: повторяем по одной
+            for sql, params, future in batch:
+                try:
+                    rowid = await self.storage.execute(sql, params) if sql else None
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    if not future.done():
+                        future.set_result(rowid)
+            return
+
+        for (_, _, future), rowid in zip(batch, rowids):
+            if not future.done():
+                future.set_result(rowid)
@@ -0,0 +1,83 @@
+import asyncio
+from collections import deque
+from datetime import datetime, timezone
+
+
+class AuditLogCache:
+    """Последние записи журнала аудита каждого сервера из события on_audit_log_entry_create.
+
+    Для каждого сервера хранится кольцевой буфер на size записей и индекс
+    (действие, ID цели) -> записи. Обработчики событий находят модератора и причину
+    без запроса к API. Если событие пришло раньше записи аудита, ее можно
+    подождать (см. find).
+    """
+
+    def __init__(self, size=50):
+        self.size = size
+        self._entries = {}
+        self._index = {}
+        # (сервер, действие, цель) -> ожидающие futures
+        self._waiters = {}
+
+    @staticmethod
+    def _target_id(entry):
+        return getattr(entry.target, "id", None)
+
+    def add(self, entry):
+        guild_id = entry.guild.id
+        ring = self._entries.setdefault(guild_id, deque())
+        index = self._index.setdefault(guild_id, {})
+
+        if len(ring) >= self.size:
+            old = ring.popleft()
+            key = (old.action, self._target_id(old))
+            bucket = index.get(key)
+            if bucket:
+                bucket.remove(old)
+                if not bucket:
+                    del index[key]
+
+        key = (entry.action, self._target_id(entry))
+        ring.append(entry)
+        index.setdefault(key, []).append(entry)
+
+        for future in self._waiters.pop((guild_id, *key), []):
+            if not future.done():
+                future.set_result(entry)
+
+    def get(self, guild_id, action, target_id, max_age=None, check=None):
+        """Самая свежая подходящая запись из кэша или None"""
+        entries = self._index.get(guild_id, {}).get((action, target_id), ())
+        now = datetime.now(timezone.utc)
+        for entry in reversed(entries):
+            if max_age is not None and (now - entry.created_at).total_seconds() > max_age:
+                break
+            if check is None or check(entry):
+                return entry
+        return None
+
+    async def find(self, guild_id, action, target_id, max_age=30, check=None, timeout=1.5):
+        """Запись из кэша; если ее еще нет - ждать до timeout секунд, пока она придет"""
+        entry = self.get(guild_id, action, target_id, max_age, check)
+        if entry or not timeout:
+            return entry
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        key = (guild_id, action, target_id)
+        while (remaining := deadline - loop.time()) > 0:
+            future = loop.create_future()
+            self._waiters.setdefault(key, []).append(future)
+            try:
+                entry = await asyncio.wait_for(future, remaining)
+            except asyncio.TimeoutError:
+                break
+            finally:
+                waiters = self._waiters.get(key)
+                if waiters and future in waiters:
+                    waiters.remove(future)
+                    if not waiters:
+                        del self._waiters[key]
+            if check is None or check(entry):
+                return entry
+        return None
@@ -0,0 +1,106 @@
+import time
+
+
+class CooldownStore:
+    """Кулдауны с истечением по TTL, ограничением размера и необязательным хранением в SQLite.
+
+    Истекшие записи вычищаются колесом таймеров: запись лежит в слоте своего срока,
+    и при каждом обращении проходятся только слоты, время которых уже наступило.
+    scope отделяет кулдауны разных команд в общей таблице cooldowns.
+    Ключи - строки или числа.
+    """
+
+    def __init__(self, scope, storage=None, max_entries=10000, slots=512, resolution=1.0):
+        self.scope = scope
+        self.storage = storage
+        self.max_entries = max_entries
+        self.slots = slots
+        self.resolution = resolution
+        # Ключ -> unix-время окончания; порядок вставки = порядок вытеснения при переполнении
+        self.expires = {}
+        self._wheel = [set() for _ in range(slots)]
+        self._tick = self._now_tick()
+
+    def __len__(self):
+        self._sweep()
+        return len(self.expires)
+
+    def _now_tick(self):
+        return int(time.time() / self.resolution)
+
+    def _slot(self, expires_at):
+        return int(expires_at / self.resolution) % self.slots
+
+    def _sweep(self):
+        now = time.time()
+        current = self._now_tick()
+        if current == self._tick:
+            return
+        # Проходим полностью прошедшие тики; после долгого простоя хватает одного оборота колеса
+        for tick in range(max(self._tick, current - self.slots), current):
+            bucket = self._wheel[tick % self.slots]
+            # В слоте могут лежать записи следующих оборотов - их не трогаем
+            for key in [key for key in bucket if self.expires.get(key, 0) <= now]:
+                bucket.discard(key)
+                self.expires.pop(key, None)
+        self._tick = current
+
+    def _put(self, key, expires_at):
+        previous = self.expires.pop(key, None)
+        if previous is not None:
+            self._wheel[self._slot(previous)].discard(key)
+
+        while len(self.expires) >= self.max_entries:
+            # Вытесняем самую старую запись - при одинаковом TTL она истекает раньше всех
+            oldest = next(iter(self.expires))
+            self._wheel[self._slot(self.expires.pop(oldest))].discard(oldest)
+
+        self.expires[key] = expires_at
+        self._wheel[self._slot(expires_at)].add(key)
+
+    async def load(self):
+        """Поднять неистекшие кулдауны из базы (после перезапуска бота)"""
+        if not self.storage:
+            return
+        now = time.time()
+        await self.storage.execute("DELETE FROM cooldowns WHERE expires_at <= ?", (now,))
+        rows = await self.storage.fetchall(
+            "SELECT key, expires_at FROM cooldowns WHERE scope = ? ORDER BY expires_at", (self.scope,)
+        )
+        for key, expires_at in rows:
+            # Значение, выставленное уже после старта, новее того, что в базе
+            if key not in self.expires:
+                self._put(key, expires_at)
+
+    def remaining(self, key):
+        """Сколько секунд осталось до конца кулдауна; 0, если его нет"""
+        self._sweep()
+        expires_at = self.expires.get(key)
+        if expires_at is None:
+            return 0
+        return max(expires_at - time.time(), 0)
+
+    def start(self, key, seconds):
+        """Запустить кулдаун ключа на seconds секунд"""
+        self._sweep()
+        if seconds <= 0:
+            self.reset(key)
+            return
+        expires_at = time.time() + seconds
+        self._put(key, expires_at)
+        if self.storage:
+            self.storage.append_nowait(
+                """INSERT INTO cooldowns (scope, key, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT (scope, key) DO UPDATE SET expires_at = excluded.expires_at""",
+                (self.scope, key, expires_at)
+            )
+
+    def reset(self, key):
+        """Снять кулдаун"""
+        expires_at = self.expires.pop(key, None)
+        if expires_at is not None:
+            self._wheel[self._slot(expires_at)].discard(key)
+        if self.storage:
+            self.storage.append_nowait(
+                "DELETE FROM cooldowns WHERE scope = ? AND key = ?", (self.scope, key)
+            )
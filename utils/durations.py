@@ -0,0 +1,10 @@
+def format_duration(seconds):
+    """Короткая запись длительности: 45с, 12м, 3ч 5м, 2д 4ч"""
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}с"
+    if seconds < 3600:
+        return f"{seconds // 60}м"
+    if seconds < 86400:
+        return f"{seconds // 3600}ч {seconds % 3600 // 60}м"
+    return f"{seconds // 86400}д {seconds % 86400 // 3600}ч"
@@ -0,0 +1,101 @@
+import gzip
+import html
+import json
+import shutil
+import tempfile
+
+import disnake
+
+FORMATS = ("txt", "jsonl", "html")
+
+# До этого размера файл держится в памяти, дальше уходит на диск
+SPOOL_SIZE = 1024 * 1024
+
+HTML_HEAD = """<!DOCTYPE html>
+<html lang="ru">
+<head>
+<meta charset="utf-8">
+<title>Тикет #{ticket_id}</title>
+<style>
+body {{ background: #313338; color: #dbdee1; font-family: sans-serif; margin: 24px; }}
+.msg {{ padding: 4px 0; }}
+.time {{ color: #949ba4; font-size: 12px; margin-right: 6px; }}
+.author {{ color: #f2f3f5; font-weight: bold; }}
+.content {{ white-space: pre-wrap; }}
+.att {{ color: #00a8fc; font-size: 13px; }}
+</style>
+</head>
+<body>
+<h2>Тикет #{ticket_id}</h2>
+"""
+HTML_TAIL = "</body>\n</html>\n"
+
+
+class TranscriptExport:
+    """Транскрипт, который пишется потоком во временный файл в выбранном формате"""
+
+    def __init__(self, ticket_id, fmt="txt"):
+        if fmt not in FORMATS:
+            raise ValueError(f"Неизвестный формат транскрипта: {fmt}")
+        self.ticket_id = ticket_id
+        self.fmt = fmt
+        self.rows = 0
+        self.file = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        self.finished = False
+        if fmt == "html":
+            self._write(HTML_HEAD.format(ticket_id=ticket_id))
+
+    def _write(self, text):
+        self.file.write(text.encode("utf-8"))
+
+    def add(self, timestamp, author, content, attachments=None):
+        """Дописать одно сообщение"""
+        if self.fmt == "txt":
+            suffix = f" | Вложения: {attachments}" if attachments else ""
+            # Строки через \n без завершающего перевода - как в старых транскриптах
+            self._write(("\n" if self.rows else "") + f"[{timestamp}] {author}: {content}{suffix}")
+        elif self.fmt == "jsonl":
+            self._write(json.dumps({
+                "time": timestamp,
+                "author": author,
+                "content": content,
+                "attachments": attachments.split(", ") if attachments else [],
+            }, ensure_ascii=False) + "\n")
+        else:
+            att = f'<div class="att">📎 {html.escape(attachments)}</div>' if attachments else ""
+            self._write(
+                f'<div class="msg"><span class="time">{html.escape(timestamp)}</span>'
+                f'<span class="author">{html.escape(author)}</span>: '
+                f'<span class="content">{html.escape(content)}</span>{att}</div>\n'
+            )
+        self.rows += 1
+
+    def add_text(self, text):
+        """Дописать готовый текст (уже сохраненный транскрипт в формате txt)"""
+        self._write(text)
+        if text:
+            self.rows = self.rows or 1
+
+    def finish(self):
+        """Закрыть документ и перемотать файл в начало; вернуть размер в байтах"""
+        if not self.finished:
+            if self.fmt == "html":
+                self._write(HTML_TAIL)
+            self.finished = True
+        size = self.file.seek(0, 2)
+        self.file.seek(0)
+        return size
+
+    def to_file(self, limit=None):
+        """disnake.File для отправки; если файл больше limit, он сжимается gzip"""
+        size = self.finish()
+        filename = f"ticket_{self.ticket_id}.{self.fmt}"
+        if limit is None or size <= limit:
+            return disnake.File(self.file, filename=filename)
+
+        packed = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        with gzip.GzipFile(filename=filename, mode="wb", fileobj=packed) as archive:
+            shutil.copyfileobj(self.file, archive)
+        self.file.close()
+        packed.seek(0)
+        return disnake.File(packed, filename=f"{filename}.gz")
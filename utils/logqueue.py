@@ -0,0 +1,104 @@
+import asyncio
+
+import disnake
+
+# Ограничения Discord на одно сообщение
+MAX_EMBEDS = 10
+MAX_EMBED_CHARS = 6000
+# Цель отправки больше недоступна: вебхук удален или его токен сброшен, канал удален, нет прав
+GONE = (401, 403, 404)
+
+
+class LogQueue:
+    """Очереди логов по каналам: накопившиеся эмбеды уходят пачками до 10 штук в сообщении.
+
+    Пачка отправляется, когда набралось 10 эмбедов или прошло interval секунд
+    с первого из них. На 429 и ошибки сервера Discord - повтор с растущей паузой.
+    Обработчик канала живет, пока в канал есть что отправлять.
+    Если цель недоступна, пачка передается в on_gone(цель, эмбеды); True - пачка пристроена.
+    """
+
+    def __init__(self, interval=1.0, retries=5, idle=60, on_gone=None):
+        self.interval = interval
+        self.on_gone = on_gone
+        self.retries = retries
+        self.idle = idle
+        self._queues = {}
+        self._workers = {}
+
+    @property
+    def depth(self):
+        """Сколько эмбедов ждут отправки во всех каналах"""
+        return sum(queue.qsize() for queue in self._queues.values())
+
+    def depths(self):
+        """Длина очереди по каждому каналу"""
+        return {channel_id: queue.qsize() for channel_id, queue in self._queues.items() if queue.qsize()}
+
+    def send(self, channel, embed):
+        """Поставить эмбед в очередь канала"""
+        queue = self._queues.setdefault(channel.id, asyncio.Queue())
+        queue.put_nowait(embed)
+        worker = self._workers.get(channel.id)
+        if worker is None or worker.done():
+            self._workers[channel.id] = asyncio.create_task(self._run(channel, queue))
+
+    def close(self):
+        for worker in self._workers.values():
+            worker.cancel()
+        self._workers.clear()
+
+    async def _run(self, channel, queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                first = await asyncio.wait_for(queue.get(), self.idle)
+            except asyncio.TimeoutError:
+                if queue.empty():
+                    # Без await между проверкой и удалением: новый эмбед увидит, что обработчика нет
+                    self._workers.pop(channel.id, None)
+                    return
+                continue
+
+            batch = [first]
+            size = len(first)
+            deadline = loop.time() + self.interval
+            while len(batch) < MAX_EMBEDS:
+                try:
+                    embed = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        embed = await asyncio.wait_for(queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if size + len(embed) > MAX_EMBED_CHARS:
+                    # Не влезает по суммарной длине - отправляем то, что есть, и начинаем новую пачку
+                    await self._deliver(channel, batch)
+                    batch, size = [], 0
+                batch.append(embed)
+                size += len(embed)
+
+            await self._deliver(channel, batch)
+
+    async def _deliver(self, channel, batch):
+        delay = 1.0
+        for attempt in range(self.retries):
+            try:
+                await channel.send(embeds=batch)
+                return
+            except disnake.HTTPException as e:
+                if e.status in GONE:
+                    if self.on_gone and await self.on_gone(channel, batch):
+                        return
+                    print(f"Лог в канал {channel.id} не отправлен: {e}")
+                    return
+                if e.status != 429 and e.status < 500:
+                    print(f"Лог в канал {channel.id} не отправлен: {e}")
+                    return
+                retry_after = getattr(e, "retry_after", None)
+                await asyncio.sleep(retry_after or delay)
+                delay *= 2
+        print(f"Лог в канал {channel.id} не отправлен после {self.retries} попыток, потеряно эмбедов: {len(batch)}")
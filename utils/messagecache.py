@@ -0,0 +1,71 @@
+from collections import OrderedDict
+
+# Примерные накладные расходы на одну запись: ключ, кортеж, объекты bytes
+ENTRY_OVERHEAD = 200
+
+
+class CachedMessage:
+    """То, что нужно логам от удаленного или измененного сообщения"""
+
+    __slots__ = ("id", "channel_id", "author_id", "content", "attachments")
+
+    def __init__(self, message_id, channel_id, author_id, content, attachments):
+        self.id = message_id
+        self.channel_id = channel_id
+        self.author_id = author_id
+        self.content = content
+        self.attachments = attachments
+
+
+class MessageCache:
+    """Содержимое последних сообщений в пределах бюджета памяти, с вытеснением по LRU.
+
+    Хранится компактно: текст в UTF-8 обрезается до max_content символов,
+    от вложений остаются только имена файлов.
+    """
+
+    def __init__(self, budget=8 * 1024 * 1024, max_content=1000):
+        self.budget = budget
+        self.max_content = max_content
+        self.size = 0
+        # ID сообщения -> (канал, автор, текст в байтах, имена вложений)
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _cost(entry):
+        return ENTRY_OVERHEAD + len(entry[2]) + sum(len(name) for name in entry[3])
+
+    def put(self, message_id, channel_id, author_id, content, attachments=()):
+        self.discard(message_id)
+        entry = (channel_id, author_id, (content or "")[:self.max_content].encode("utf-8"), tuple(attachments))
+        self._entries[message_id] = entry
+        self.size += self._cost(entry)
+
+        while self.size > self.budget and self._entries:
+            _, old = self._entries.popitem(last=False)
+            self.size -= self._cost(old)
+
+    def add(self, message):
+        self.put(message.id, message.channel.id, message.author.id, message.content,
+                 [attachment.filename for attachment in message.attachments])
+
+    def get(self, message_id):
+        entry = self._entries.get(message_id)
+        if entry is None:
+            return None
+        self._entries.move_to_end(message_id)
+        channel_id, author_id, content, attachments = entry
+        return CachedMessage(message_id, channel_id, author_id, content.decode("utf-8"), attachments)
+
+    def pop(self, message_id):
+        message = self.get(message_id)
+        self.discard(message_id)
+        return message
+
+    def discard(self, message_id):
+        entry = self._entries.pop(message_id, None)
+        if entry is not None:
+            self.size -= self._cost(entry)
@@ -0,0 +1,80 @@
+import asyncio
+import heapq
+import time
+
+
+class DeadlineScheduler:
+    """Вызывает callback(key), когда наступает срок ключа; ждет ровно до ближайшего срока.
+
+    Сроки лежат в min-куче. Продление срока (новая активность) только меняет словарь:
+    старая запись в куче при извлечении просто переставляется на новый срок.
+    После cancel() запись остается в куче до своего срока и тогда пропускается, так что
+    cancel() с последующим schedule() может оставить на ключ несколько записей с разными
+    сроками; одинаковая пара (срок, ключ) в куче не повторяется, а callback вызывается
+    только для актуального срока.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.deadlines = {}
+        self._heap = []
+        # Пары (срок, ключ), которые сейчас лежат в куче
+        self._queued = set()
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def schedule(self, key, deadline):
+        """Назначить или перенести срок ключа (unix-время)"""
+        current = self.deadlines.get(key)
+        self.deadlines[key] = deadline
+        if current is not None and deadline >= current:
+            # Запись в куче уже есть и сработает не позже нового срока
+            return
+        if self._push(deadline, key) and self._heap[0][1] == key:
+            self._wakeup.set()
+
+    def _push(self, deadline, key):
+        if (deadline, key) in self._queued:
+            return False
+        self._queued.add((deadline, key))
+        heapq.heappush(self._heap, (deadline, key))
+        return True
+
+    def cancel(self, key):
+        # Запись в куче останется и будет пропущена при извлечении
+        self.deadlines.pop(key, None)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                deadline, key = heapq.heappop(self._heap)
+                self._queued.discard((deadline, key))
+                actual = self.deadlines.get(key)
+                if actual is None or actual < deadline:
+                    # Отменен, либо это дубль после сокращения срока
+                    continue
+                if actual > deadline:
+                    self._push(actual, key)
+                    continue
+                del self.deadlines[key]
+                try:
+                    await self.callback(key)
+                except Exception as e:
+                    print(f"Ошибка в задаче по расписанию {key}: {e}")
+
+            timeout = self._heap[0][0] - time.time() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
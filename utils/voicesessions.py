@@ -0,0 +1,78 @@
+import time
+
+from utils.scheduler import DeadlineScheduler
+
+
+class VoiceSession:
+    """Непрерывное пребывание участника в голосовых каналах сервера"""
+
+    __slots__ = ("guild", "member", "started", "ended", "path")
+
+    def __init__(self, member, started):
+        self.guild = member.guild
+        self.member = member
+        self.started = started
+        self.ended = None
+        # [название канала, с какого момента], по порядку переходов
+        self.path = []
+
+    @property
+    def duration(self):
+        return (self.ended or time.time()) - self.started
+
+    def hop(self, channel_name, now, debounce):
+        if self.path and now - self.path[-1][1] < debounce:
+            # В канале пробыл меньше окна - это промежуточный переход (например, канал-создатель)
+            self.path.pop()
+        if self.path and self.path[-1][0] == channel_name:
+            return
+        self.path.append([channel_name, now])
+
+    def channels(self):
+        return [name for name, _ in self.path]
+
+
+class VoiceSessions:
+    """Голосовые сессии участников в памяти.
+
+    Выход из голосового не завершает сессию сразу: если участник вернулся в течение
+    debounce секунд, сессия продолжается. Завершенная сессия передается в on_finish.
+    """
+
+    def __init__(self, on_finish, debounce=15):
+        self.on_finish = on_finish
+        self.debounce = debounce
+        # (сервер, участник) -> VoiceSession
+        self.sessions = {}
+        self.scheduler = DeadlineScheduler(self._finish)
+
+    def start(self):
+        self.scheduler.start()
+
+    def stop(self):
+        self.scheduler.stop()
+
+    def update(self, member, before, after):
+        """Учесть смену канала участника (before / after - каналы или None)"""
+        key = (member.guild.id, member.id)
+        now = time.time()
+        session = self.sessions.get(key)
+
+        if after is None:
+            if session:
+                session.ended = now
+                self.scheduler.schedule(key, now + self.debounce)
+            return
+
+        if session is None:
+            session = self.sessions[key] = VoiceSession(member, now)
+        elif session.ended is not None:
+            # Вернулся в пределах окна - это та же сессия
+            session.ended = None
+            self.scheduler.cancel(key)
+        session.hop(after.name, now, self.debounce)
+
+    async def _finish(self, key):
+        session = self.sessions.pop(key, None)
+        if session and session.ended is not None:
+            await self.on_finish(session)